@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import response_cache
+        from .views import AuthorListView, BookListView
+        response_cache.connect_view(BookListView)
+        response_cache.connect_view(AuthorListView)
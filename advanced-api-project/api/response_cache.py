@@ -0,0 +1,139 @@
+"""
+Response cache for anonymous DRF list/retrieve requests.
+
+Every anonymous visitor of a public list gets the same JSON, so
+CachedResponseMixin keeps the response data (and its ETag/Last-Modified) in
+the RESPONSE_CACHE_ALIAS cache. Keys are built from the view, path, query
+parameters, the authenticating class and the negotiated media type. A hit
+costs no database query and no serialization. Authenticated requests are
+never cached, since their representation may depend on the user.
+
+Eviction comes from the cache backend: the default alias is a LocMemCache
+(LRU, bounded by MAX_ENTRIES, with TTL RESPONSE_CACHE_TIMEOUT). A
+FileBasedCache alias shares entries between the processes of one host.
+
+Invalidation is per model. Each view lists the models its representation
+is built from in `cache_depends_on`, and `connect_view` (called from
+AppConfig.ready) hooks their post_save/post_delete. Every key embeds the
+current version token of those models. A write replaces the token, so all
+dependent entries are orphaned at once and age out. Writes that bypass
+signals (QuerySet.update) must call `invalidate` themselves. With a
+per-process LocMemCache, other processes only see the new token once their
+entries expire.
+"""
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'responses')]
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60)
+
+
+def _label(model):
+    if isinstance(model, str):
+        model = apps.get_model(model)
+    return model._meta.label_lower
+
+
+def _version_key(label):
+    return f'resp:version:{label}'
+
+
+def versions(models):
+    """Current version token of each model, creating missing ones."""
+    cache = _cache()
+    keys = [_version_key(_label(model)) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # A fresh token rather than a counter: an evicted version can never
+            # come back with a value that matches old entries
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def invalidate(*models):
+    """Orphan every cached response that depends on these models."""
+    _cache().set_many({_version_key(_label(model)): time.time_ns() for model in models}, None)
+
+
+def _on_change(sender, **kwargs):
+    invalidate(sender)
+
+
+def connect_view(view_class):
+    """Invalidate the view's entries whenever one of its `cache_depends_on` models changes."""
+    for model in view_class.cache_depends_on:
+        model = apps.get_model(model) if isinstance(model, str) else model
+        for signal in (post_save, post_delete):
+            signal.connect(_on_change, sender=model, dispatch_uid=f'response_cache:{_label(model)}:{signal}')
+
+
+class CachedResponseMixin:
+    # Models (or 'app_label.Model' strings) the representation is built from
+    cache_depends_on = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, super().list, args, kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, super().retrieve, args, kwargs)
+
+    def _cache_key(self, request):
+        authenticator = request.successful_authenticator
+        variant = (
+            type(self).__module__,
+            type(self).__qualname__,
+            self.action if hasattr(self, 'action') else None,
+            request.path,
+            sorted(request.query_params.lists()),
+            type(authenticator).__name__ if authenticator else None,
+            request.accepted_media_type,
+            versions(self.cache_depends_on),
+        )
+        return 'resp:' + hashlib.md5(repr(variant).encode(), usedforsecurity=False).hexdigest()
+
+    def _cached(self, request, render, args, kwargs):
+        if request.user.is_authenticated:
+            return render(request, *args, **kwargs)
+        cache = _cache()
+        key = self._cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = render(request, *args, **kwargs)
+            if response.status_code == 200 and isinstance(response, Response):
+                headers = {name: response[name] for name in VALIDATOR_HEADERS if name in response}
+                cache.set(key, (response.data, headers), _timeout())
+                response['X-Cache'] = 'MISS'
+            return response
+
+        data, headers = entry
+        response = None
+        if headers:
+            # Answer revalidation from the cached validators, still without a query
+            response = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+            )
+        if response is None:
+            response = Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        response['X-Cache'] = 'HIT'
+        return response
@@ -1,3 +1,4 @@
+from django.core.cache import caches
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
@@ -384,4 +385,26 @@ class BookAPITestCase(APITestCase):
         response = self.client.post(url, payload, format='json')
         # This might return 400 if unique_together validation is implemented
         self.assertIn(response.status_code, [status.HTTP_400_BAD_REQUEST, status.HTTP_201_CREATED])
-        self.client.force_authenticate(user=None)
\ No newline at end of file
+        self.client.force_authenticate(user=None)
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.author = Author.objects.create(name="Chinua Achebe")
+        self.book = Book.objects.create(title="Things Fall Apart", publication_year=1958, author=self.author)
+
+    def test_anonymous_list_is_served_from_cache(self):
+        url = reverse('book-list')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['title'], "Things Fall Apart")
+
+    def test_model_writes_invalidate_dependent_views(self):
+        url = reverse('author-list')
+        self.client.get(url)
+        Book.objects.create(title="Arrow of God", publication_year=1964, author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results'][0]['books']), 2)
@@ -3,21 +3,24 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticate
 from django_filters import rest_framework as django_filters
 from .models import Author, Book
 from .serializers import AuthorSerializer, BookSerializer
+from .response_cache import CachedResponseMixin
 
 
 # ------------------------------------------------------------
 # BOOK VIEWS - SEPARATED AS REQUIRED
 # ------------------------------------------------------------
 
-class BookListView(generics.ListAPIView):
+class BookListView(CachedResponseMixin, generics.ListAPIView):
     """
     ListView for retrieving all books.
     URL: /api/books/
     Method: GET
+    Anonymous responses are cached until a Book or Author changes.
     """
     queryset = Book.objects.select_related('author').all()
     serializer_class = BookSerializer
     permission_classes = [AllowAny]
+    cache_depends_on = ('api.Book', 'api.Author')
 
     # Enable filtering, searching, and ordering
     filter_backends = [django_filters.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -74,15 +77,17 @@ class BookDeleteView(generics.DestroyAPIView):
 # AUTHOR VIEWS - SEPARATED AS REQUIRED
 # ------------------------------------------------------------
 
-class AuthorListView(generics.ListAPIView):
+class AuthorListView(CachedResponseMixin, generics.ListAPIView):
     """
     ListView for retrieving all authors.
     URL: /api/authors/
     Method: GET
+    Anonymous responses are cached until an Author or Book changes.
     """
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [AllowAny]
+    cache_depends_on = ('api.Author', 'api.Book')
 
     # Enable search, filter, and ordering
     filter_backends = [django_filters.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
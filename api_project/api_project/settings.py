@@ -44,7 +44,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -133,3 +133,9 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Token lookups (api.authentication): shared cache TTL, then the per-process
+# LRU's TTL and size. Other processes notice a revoked token after the local TTL.
+API_TOKEN_CACHE_TTL = 5 * 60
+API_TOKEN_CACHE_LOCAL_TTL = 30
+API_TOKEN_CACHE_SIZE = 10000
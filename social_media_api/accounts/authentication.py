@@ -0,0 +1,138 @@
+"""
+Token authentication without a database hit per request.
+
+DRF's TokenAuthentication joins Token and User on every authenticated
+request. CachedTokenAuthentication looks the key up in three places, in
+order: a small LRU in process memory, the Django cache, the database. What
+is cached is a snapshot of the user's column values, never the instance, and
+it leaves out DEFERRED_FIELDS (the password hash and the follow counters,
+which are kept current with `QuerySet.update()`). request.user is rebuilt from the
+snapshot with those fields deferred: reading one loads the current value
+from the database. Only active users are cached.
+
+Deleting a token or saving a user (see accounts.signals) drops the entry from
+the Django cache and from this process' LRU; deleting a user deletes its
+tokens. Other processes may keep serving their local copy for up to
+ACCOUNTS_TOKEN_CACHE_LOCAL_TTL seconds, so keep that short. Bulk
+`QuerySet.update()` calls of snapshot fields (e.g. is_active) send no
+signals and are only picked up when the entries expire.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+# Left out of the cached snapshot: the password hash, and the follow counters
+# that accounts.signals moves with QuerySet.update()
+DEFERRED_FIELDS = ('password', 'followers_count', 'following_count')
+
+
+def _local_ttl():
+    return getattr(settings, 'ACCOUNTS_TOKEN_CACHE_LOCAL_TTL', 30)
+
+
+def _shared_ttl():
+    return getattr(settings, 'ACCOUNTS_TOKEN_CACHE_TTL', 5 * 60)
+
+
+def _local_size():
+    return getattr(settings, 'ACCOUNTS_TOKEN_CACHE_SIZE', 10000)
+
+
+def cache_key(key):
+    return f'accounts:token:{key}'
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token key -> (snapshot, expires_at)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def set(self, key, snapshot):
+        with self._lock:
+            self._entries[key] = (snapshot, time.monotonic() + _local_ttl())
+            self._entries.move_to_end(key)
+            while len(self._entries) > _local_size():
+                self._entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalTokenCache()
+
+
+def forget(keys):
+    """Drop cached lookups for these token keys."""
+    keys = list(keys)
+    local_cache.discard(keys)
+    cache.delete_many([cache_key(key) for key in keys])
+
+
+def forget_user(user):
+    forget(Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+def _snapshot_fields():
+    User = get_user_model()
+    return [field.attname for field in User._meta.concrete_fields if field.attname not in DEFERRED_FIELDS]
+
+
+def _user_from(snapshot):
+    """A fresh User per request from {attname: value}; the other fields are deferred."""
+    User = get_user_model()
+    return User.from_db(User.objects.db, list(snapshot), list(snapshot.values()))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        snapshot = local_cache.get(key)
+        if snapshot is None:
+            snapshot = cache.get(cache_key(key))
+            if snapshot is None:
+                snapshot = self._load_snapshot(key)
+                cache.set(cache_key(key), snapshot, _shared_ttl())
+            local_cache.set(key, snapshot)
+        user = _user_from(snapshot)
+        # Unsaved stand-in so request.auth keeps its usual shape
+        return user, Token(key=key, user=user)
+
+    def _load_snapshot(self, key):
+        # The same Token/User join as TokenAuthentication, reading raw column values
+        names = _snapshot_fields()
+        try:
+            values = get_user_model().objects.filter(auth_token__key=key).values_list(*names).get()
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        snapshot = dict(zip(names, values))
+        if not snapshot['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return snapshot
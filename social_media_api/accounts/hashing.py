@@ -0,0 +1,135 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 is deliberately slow, and during login/registration bursts it takes
+over the CPU of whichever worker is serving the request. With
+ACCOUNTS_ASYNC_HASHING enabled, the async login/register views hand hashing
+to a bounded ProcessPoolExecutor of ACCOUNTS_HASHING_WORKERS processes. The
+event loop keeps serving other requests while a hash is computed.
+
+Back-pressure: at most ACCOUNTS_HASHING_MAX_PENDING hashes may be queued or
+running. Past that, `HashingOverloaded` is raised and the views answer 503
+with Retry-After instead of letting latency grow without bound. `metrics()`
+returns counters for dashboards (see HashingMetricsView).
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingOverloaded(Exception):
+    """Too many hashes queued; the caller should retry later."""
+
+
+def _init_worker():
+    # Workers are spawned fresh, so they load settings (PASSWORD_HASHERS) themselves
+    import django
+    django.setup()
+
+
+def _make_password(raw_password):
+    return hashers.make_password(raw_password)
+
+
+def _verify_password(raw_password, encoded):
+    """(valid, new_encoded); new_encoded is set when the stored hash should be upgraded."""
+    if not hashers.check_password(raw_password, encoded):
+        return False, None
+    preferred = hashers.get_hasher()
+    if hashers.identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, hashers.make_password(raw_password)
+    return True, None
+
+
+class HashingPool:
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+            'busy_seconds': 0.0, 'max_seconds': 0.0,
+        }
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise HashingOverloaded
+            self._pending += 1
+            self._stats['submitted'] += 1
+            executor = self._get_executor()
+        started = time.monotonic()
+        outcome = 'failed'
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            outcome = 'completed'
+            return result
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._pending -= 1
+                self._stats[outcome] += 1
+                self._stats['busy_seconds'] += elapsed
+                self._stats['max_seconds'] = max(self._stats['max_seconds'], elapsed)
+
+    def metrics(self):
+        with self._lock:
+            finished = self._stats['completed'] + self._stats['failed']
+            return {
+                **self._stats,
+                'pending': self._pending,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'avg_seconds': self._stats['busy_seconds'] / finished if finished else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    workers=getattr(settings, 'ACCOUNTS_HASHING_WORKERS', 2),
+                    max_pending=getattr(settings, 'ACCOUNTS_HASHING_MAX_PENDING', 32),
+                )
+    return _pool
+
+
+async def make_password(raw_password):
+    return await get_pool().run(_make_password, raw_password)
+
+
+async def verify_password(raw_password, encoded):
+    return await get_pool().run(_verify_password, raw_password, encoded)
+
+
+def metrics():
+    return get_pool().metrics()
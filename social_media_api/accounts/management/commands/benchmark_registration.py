@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from accounts.serializers import UserSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_register(data):
+    """The old path: create_user, then set_password + save, then the view's re-fetch and get_or_create."""
+    serializer = UserSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    fields = dict(serializer.validated_data)
+    password = fields.pop('password')
+    User = get_user_model()
+    user = User.objects.create_user(**fields)
+    user.set_password(password)
+    user.save()
+    Token.objects.create(user=user)
+    user = User.objects.get(pk=user.pk)
+    Token.objects.get_or_create(user=user)
+
+
+def _current_register(data):
+    serializer = UserSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and CPU time per registration, for the current path and "
+        "the old double-hashing one. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20)
+
+    def measure(self, label, register, count):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.process_time()
+            try:
+                with transaction.atomic():
+                    for i in range(count):
+                        register({
+                            'username': f'bench-{label}-{i}',
+                            'email': f'bench-{label}-{i}@example.com',
+                            'password': 'bench-password-1',
+                        })
+                    raise _Rollback
+            except _Rollback:
+                pass
+            cpu = time.process_time() - started
+        # The surrounding SAVEPOINT/ROLLBACK are not part of a registration
+        per_user = (len(queries) - 2) / count
+        self.stdout.write(f"{label:>8}: {per_user:.1f} queries, {cpu / count * 1000:.1f} ms CPU per registration")
+
+    def handle(self, *args, **options):
+        self.measure('current', _current_register, options['count'])
+        self.measure('legacy', _legacy_register, options['count'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the follow/like graph in one pass and store every user's "
+        "'who to follow' suggestions. Run it periodically (e.g. hourly) to pick "
+        "up new likes and re-rank the lists follows have adjusted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only refresh this user (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = suggestions.precompute(options['user_ids'], batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Stored suggestions for {total} user(s) in {elapsed:.1f}s."))
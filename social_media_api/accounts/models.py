@@ -5,6 +5,32 @@ class User(AbstractUser):
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
     following = models.ManyToManyField('self', symmetrical=False, related_name='followers', blank=True)
+    # Denormalized sizes of the follow graph, kept current by accounts.signals
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
+
+
+class FollowSuggestion(models.Model):
+    """
+    One ranked "who to follow" candidate (see accounts.suggestions). Written in
+    bulk by `manage.py build_follow_graph` and adjusted in place as users follow
+    and unfollow.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'suggested'], name='accounts_suggestion_unique'),
+        ]
+        indexes = [
+            # A user's suggestions, best first
+            models.Index(fields=['user', '-score', 'suggested'], name='accounts_suggestion_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.suggested_id} ({self.score})"
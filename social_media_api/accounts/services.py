@@ -0,0 +1,26 @@
+"""
+Account write paths shared by the API views and management commands.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+
+def register_user(password=None, *, encoded_password=None, email='', **fields):
+    """
+    Create a user and their API token in one transaction.
+
+    The password is hashed exactly once (the expensive part of signing up),
+    or not at all here when the caller already hashed it (`encoded_password`,
+    see accounts.hashing). Each row is written with a single INSERT and the
+    token is reachable as `user.auth_token` without another query.
+    """
+    User = get_user_model()
+    user = User(email=User.objects.normalize_email(email), **fields)
+    user.username = User.normalize_username(user.username)
+    user.password = encoded_password if encoded_password is not None else make_password(password)
+    with transaction.atomic():
+        user.save()
+        Token.objects.create(user=user)
+    return user
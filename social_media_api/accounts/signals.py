@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from . import authentication, suggestions
+
+User = get_user_model()
+Follow = User.following.through
+
+
+def _shift_counts(instance, other_ids, reverse, delta):
+    """
+    Apply a follow/unfollow between `instance` and `other_ids` to the counters
+    with F() updates. Not reversed: instance follows the others; reversed:
+    the others follow instance.
+    """
+    if not other_ids:
+        return
+    own, others = ('followers_count', 'following_count') if reverse else ('following_count', 'followers_count')
+    User.objects.filter(pk=instance.pk).update(**{own: F(own) + delta * len(other_ids)})
+    User.objects.filter(pk__in=other_ids).update(**{others: F(others) + delta})
+
+
+def _existing_ids(instance, reverse, pk_set=None):
+    relation = instance.followers if reverse else instance.following
+    if pk_set is not None:
+        relation = relation.filter(pk__in=pk_set)
+    return set(relation.values_list('pk', flat=True))
+
+
+def _update_suggestions(instance, other_ids, reverse, update):
+    # Adjust the stored rankings of whoever followed or unfollowed
+    if not other_ids:
+        return
+    if reverse:
+        for follower_id in other_ids:
+            update(follower_id, [instance.pk])
+    else:
+        update(instance.pk, other_ids)
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        # Django only reports the rows it actually inserted
+        _shift_counts(instance, pk_set, reverse, +1)
+        _update_suggestions(instance, pk_set, reverse, suggestions.followed)
+    elif action == 'pre_remove':
+        # pk_set may name users that were never followed; keep the real ones
+        instance._follow_removed_ids = _existing_ids(instance, reverse, pk_set)
+    elif action == 'pre_clear':
+        instance._follow_removed_ids = _existing_ids(instance, reverse)
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop('_follow_removed_ids', set())
+        _shift_counts(instance, removed, reverse, -1)
+        _update_suggestions(instance, removed, reverse, suggestions.unfollowed)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    authentication.forget([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user_tokens(sender, instance, created, **kwargs):
+    # Cached lookups carry a snapshot of the user; drop them so profile edits
+    # and deactivation (is_active=False) take effect on the next request
+    if not created:
+        authentication.forget_user(instance)
@@ -0,0 +1,205 @@
+"""
+"Who to follow" suggestions from the social graph.
+
+Candidates are scored by friends-of-friends overlap (people followed by the
+people you follow) and by shared likes (people who liked the same posts as
+you). The graph is held as sorted integer arrays, which keeps it compact and
+makes membership tests a binary search.
+
+Rankings are stored as FollowSuggestion rows. `manage.py build_follow_graph`
+loads the whole graph in a few sequential scans and rewrites every user's
+rows; a user with no rows gets their list computed from their neighbourhood
+with a handful of indexed IN queries, never a self-join. A follow or
+unfollow adjusts only the follower's own rows in place (`followed`,
+`unfollowed`), with a few queries bounded by the people involved. Everything
+further out (the follower's followers, who now reach new friends-of-friends)
+is left to the periodic rebuild, as are likes, and a list is capped at
+MAX_SUGGESTIONS when it is rebuilt, so the rebuild remains the source of
+truth.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import FollowSuggestion
+
+FRIEND_OF_FRIEND_WEIGHT = 2
+SHARED_LIKE_WEIGHT = 1
+MAX_SUGGESTIONS = 50
+
+
+def _sorted_array(values):
+    return array('q', sorted(values))
+
+
+def _contains(sorted_ids, value):
+    i = bisect_left(sorted_ids, value)
+    return i < len(sorted_ids) and sorted_ids[i] == value
+
+
+def _adjacency(pairs):
+    """{key: sorted array of values} from (key, value) pairs ordered by key."""
+    return {key: _sorted_array(value for _, value in group) for key, group in groupby(pairs, key=itemgetter(0))}
+
+
+class SocialGraph:
+    """Follow and like adjacency: following[user], liked[user] and likers[post]."""
+
+    def __init__(self, following, liked, likers):
+        self.following = following
+        self.liked = liked
+        self.likers = likers
+
+    @classmethod
+    def load(cls):
+        """The whole graph, from three ordered scans."""
+        Follow = get_user_model().following.through
+        Like = apps.get_model('posts', 'Like')
+        following = _adjacency(
+            Follow.objects.order_by('from_user_id', 'to_user_id').values_list('from_user_id', 'to_user_id').iterator()
+        )
+        liked = _adjacency(Like.objects.order_by('user_id', 'post_id').values_list('user_id', 'post_id').iterator())
+        likers = _adjacency(Like.objects.order_by('post_id', 'user_id').values_list('post_id', 'user_id').iterator())
+        return cls(following, liked, likers)
+
+    @classmethod
+    def load_for(cls, user_id):
+        """Just the neighbourhood needed to rank candidates for one user."""
+        Follow = get_user_model().following.through
+        Like = apps.get_model('posts', 'Like')
+        own = list(Follow.objects.filter(from_user_id=user_id).values_list('from_user_id', 'to_user_id'))
+        second = Follow.objects.filter(from_user_id__in=[to for _, to in own]).order_by('from_user_id', 'to_user_id')
+        following = _adjacency(own)
+        following.update(_adjacency(second.values_list('from_user_id', 'to_user_id')))
+
+        liked = _adjacency(Like.objects.filter(user_id=user_id).order_by('post_id').values_list('user_id', 'post_id'))
+        post_ids = liked.get(user_id, ())
+        likers = _adjacency(
+            Like.objects.filter(post_id__in=list(post_ids)).order_by('post_id', 'user_id').values_list('post_id', 'user_id')
+        )
+        return cls(following, liked, likers)
+
+    def rank(self, user_id, limit=MAX_SUGGESTIONS):
+        """[(candidate_id, score), ...] best first; excludes the user and whoever they already follow."""
+        followed = self.following.get(user_id, array('q'))
+        scores = Counter()
+        for friend in followed:
+            for candidate in self.following.get(friend, ()):
+                scores[candidate] += FRIEND_OF_FRIEND_WEIGHT
+        for post_id in self.liked.get(user_id, ()):
+            for candidate in self.likers.get(post_id, ()):
+                scores[candidate] += SHARED_LIKE_WEIGHT
+        ranked = (
+            (candidate, score) for candidate, score in scores.items()
+            if candidate != user_id and not _contains(followed, candidate)
+        )
+        return sorted(ranked, key=lambda item: (-item[1], item[0]))[:limit]
+
+    def user_ids(self):
+        ids = set(self.following) | set(self.liked)
+        for followed in self.following.values():
+            ids.update(followed)
+        return ids
+
+
+def _store(rankings):
+    """Replace the stored suggestions of each user in {user_id: ranked}."""
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=list(rankings)).delete()
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(user_id=user_id, suggested_id=candidate, score=score)
+            for user_id, ranked in rankings.items()
+            for candidate, score in ranked
+        )
+
+
+def _add_scores(user_id, deltas):
+    """Shift one user's stored scores by {candidate: delta}; rows that reach zero are dropped."""
+    deltas = {candidate: delta for candidate, delta in deltas.items() if delta and candidate != user_id}
+    if not deltas:
+        return
+    rows = FollowSuggestion.objects.filter(user_id=user_id)
+    scores = dict(rows.filter(suggested_id__in=list(deltas)).values_list('suggested_id', 'score'))
+    for candidate, delta in deltas.items():
+        scores[candidate] = scores.get(candidate, 0) + delta
+    rows.filter(suggested_id__in=[candidate for candidate, score in scores.items() if score <= 0]).delete()
+    FollowSuggestion.objects.bulk_create(
+        [FollowSuggestion(user_id=user_id, suggested_id=candidate, score=score)
+         for candidate, score in scores.items() if score > 0],
+        update_conflicts=True, unique_fields=['user', 'suggested'], update_fields=['score'],
+    )
+
+
+def suggestions_for(user_id, limit=10):
+    """Stored ranked suggestions; computes and stores this user's list when there is none."""
+    ranked = list(
+        FollowSuggestion.objects.filter(user_id=user_id)
+        .order_by('-score', 'suggested_id').values_list('suggested_id', 'score')[:limit]
+    )
+    if not ranked:
+        ranked = SocialGraph.load_for(user_id).rank(user_id)
+        _store({user_id: ranked})
+    return ranked[:limit]
+
+
+def precompute(user_ids=None, batch_size=500):
+    """Build the full graph once and store suggestions for every (or the given) user."""
+    graph = SocialGraph.load()
+    targets = sorted(user_ids if user_ids is not None else graph.user_ids())
+    for start in range(0, len(targets), batch_size):
+        _store({user_id: graph.rank(user_id) for user_id in targets[start:start + batch_size]})
+    return len(targets)
+
+
+def followed(user_id, followed_ids):
+    """
+    Fold new follows by `user_id` into the stored suggestions: the followed
+    users leave the list and the people they follow gain friend-of-friend
+    weight. Users whose list hasn't been computed yet are left for their next
+    read.
+    """
+    if not FollowSuggestion.objects.filter(user_id=user_id).exists():
+        return
+    FollowSuggestion.objects.filter(user_id=user_id, suggested_id__in=list(followed_ids)).delete()
+    _add_scores(user_id, _friend_of_friend_scores(user_id, followed_ids, FRIEND_OF_FRIEND_WEIGHT))
+
+
+def unfollowed(user_id, unfollowed_ids):
+    """The reverse of `followed`; the unfollowed users become candidates again."""
+    if not FollowSuggestion.objects.filter(user_id=user_id).exists():
+        return
+    deltas = _friend_of_friend_scores(user_id, unfollowed_ids, -FRIEND_OF_FRIEND_WEIGHT)
+    Follow = get_user_model().following.through
+    Like = apps.get_model('posts', 'Like')
+    following = Follow.objects.filter(from_user_id=user_id).values('to_user_id')
+    # What the unfollowed users score on their own: shared friends and likes
+    shared_friends = Follow.objects.filter(from_user_id__in=following, to_user_id__in=list(unfollowed_ids))
+    for candidate in shared_friends.values_list('to_user_id', flat=True):
+        deltas[candidate] += FRIEND_OF_FRIEND_WEIGHT
+    shared_likes = Like.objects.filter(
+        user_id__in=list(unfollowed_ids), post_id__in=Like.objects.filter(user_id=user_id).values('post_id'),
+    )
+    for candidate in shared_likes.values_list('user_id', flat=True):
+        deltas[candidate] += SHARED_LIKE_WEIGHT
+    _add_scores(user_id, deltas)
+
+
+def _friend_of_friend_scores(user_id, friend_ids, weight):
+    """{candidate: weight per link} over the people `friend_ids` follow, minus whoever user_id follows."""
+    Follow = get_user_model().following.through
+    following = Follow.objects.filter(from_user_id=user_id).values('to_user_id')
+    candidates = (
+        Follow.objects.filter(from_user_id__in=list(friend_ids))
+        .exclude(to_user_id=user_id).exclude(to_user_id__in=following)
+        .values_list('to_user_id', flat=True)
+    )
+    scores = Counter()
+    for candidate in candidates:
+        scores[candidate] += weight
+    return scores
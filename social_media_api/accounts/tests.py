@@ -1,3 +1,290 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts import authentication, hashing, suggestions, views
+from accounts.models import FollowSuggestion
+from notifications.models import NotificationEvent
+from posts.models import Like, Post
+
+User = get_user_model()
+
+
+class FollowCountTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        self.carol = User.objects.create_user(username='carol')
+        self.client.force_authenticate(user=self.alice)
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_follow_views_maintain_counts(self):
+        self.client.post(reverse('follow_user', args=[self.bob.pk]))
+        self.client.post(reverse('follow_user', args=[self.bob.pk]))  # already following
+        self.client.post(reverse('follow_user', args=[self.carol.pk]))
+        self.assertEqual(self.counts(self.alice), (0, 2))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        self.client.post(reverse('unfollow_user', args=[self.bob.pk]))
+        self.client.post(reverse('unfollow_user', args=[self.bob.pk]))  # no longer following
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_reverse_and_clear_paths(self):
+        self.carol.followers.add(self.alice, self.bob)
+        self.assertEqual(self.counts(self.carol), (2, 0))
+        self.carol.followers.remove(self.bob, self.carol)
+        self.assertEqual(self.counts(self.carol), (1, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+        self.alice.following.clear()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.carol), (0, 0))
+
+
+class FollowListTests(APITestCase):
+    def setUp(self):
+        self.star = User.objects.create_user(username='star')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(5)]
+        for fan in self.fans:
+            fan.following.add(self.star)
+
+    def test_followers_are_cursor_paginated_newest_first(self):
+        url = reverse('user_followers', args=[self.star.pk]) + '?page_size=2'
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(user['username'] for user in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(names, [f'fan{i}' for i in reversed(range(5))])
+
+    def test_following_list(self):
+        response = self.client.get(reverse('user_following', args=[self.fans[0].pk]))
+        self.assertEqual([u['username'] for u in response.data['results']], ['star'])
+        self.assertEqual(response.data['results'][0]['followers_count'], 5)
+
+    def test_unknown_user(self):
+        response = self.client.get(reverse('user_followers', args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkFollowTests(APITestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username='me')
+        self.others = [User.objects.create_user(username=f'user{i}') for i in range(4)]
+        self.inactive = User.objects.create_user(username='gone', is_active=False)
+        self.me.following.add(self.others[0])
+        ContentType.objects.get_for_model(User)  # warm the content type cache
+        self.client.force_authenticate(user=self.me)
+
+    def test_bulk_follow(self):
+        ids = [u.pk for u in self.others] + [self.inactive.pk, self.me.pk, 9999]
+        # validate, existing follows, savepoint, INSERT, 2 counter UPDATEs,
+        # stored suggestions check, timeline backfill SELECT, release, queued
+        # notifications INSERT
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse('bulk_follow'), {'user_ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followed'], sorted(u.pk for u in self.others[1:]))
+        self.assertEqual(response.data['already_following'], [self.others[0].pk])
+        self.assertEqual(response.data['not_found'], sorted([self.inactive.pk, 9999]))
+
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 4)
+        self.assertEqual(set(self.me.following.all()), set(self.others))
+        self.others[3].refresh_from_db()
+        self.assertEqual(self.others[3].followers_count, 1)
+        self.assertEqual(NotificationEvent.objects.count(), 3)
+
+    def test_bulk_unfollow(self):
+        response = self.client.post(
+            reverse('bulk_unfollow'), {'user_ids': [self.others[0].pk, self.others[1].pk]}, format='json'
+        )
+        self.assertEqual(response.data['unfollowed'], [self.others[0].pk])
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 0)
+
+    def test_rejects_empty_and_oversized_lists(self):
+        for ids in ([], list(range(1, 102))):
+            response = self.client.post(reverse('bulk_follow'), {'user_ids': ids}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SuggestionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.me, self.friend, self.fof, self.liker, self.stranger = (
+            User.objects.create_user(username=name) for name in ('me', 'friend', 'fof', 'liker', 'stranger')
+        )
+        self.me.following.add(self.friend)
+        self.friend.following.add(self.fof, self.me)
+        post = Post.objects.create(author=self.stranger, title='t', content='c')
+        Like.objects.create(post=post, user=self.me)
+        Like.objects.create(post=post, user=self.liker)
+        self.client.force_authenticate(user=self.me)
+
+    def suggested(self):
+        response = self.client.get(reverse('follow_suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(u['username'], u['score']) for u in response.data]
+
+    def test_ranks_friends_of_friends_then_shared_likers(self):
+        self.assertEqual(self.suggested(), [('fof', 2), ('liker', 1)])
+
+    def stored(self, user):
+        rows = FollowSuggestion.objects.filter(user=user).order_by('-score', 'suggested_id')
+        return list(rows.values_list('suggested_id', 'score'))
+
+    def test_stored_until_follow_changes(self):
+        self.suggested()
+        with self.assertNumQueries(2):  # the stored ranking, then the users
+            self.suggested()
+        self.me.following.add(self.fof)
+        self.assertEqual(self.suggested(), [('liker', 1)])
+        self.me.following.remove(self.fof)
+        self.assertEqual(self.suggested(), [('fof', 2), ('liker', 1)])
+
+    def assertStoredListCurrent(self, user):
+        self.assertEqual(self.stored(user), suggestions.SocialGraph.load_for(user.pk).rank(user.pk))
+
+    def test_follows_adjust_the_followers_list_in_place(self):
+        self.liker.following.add(self.stranger)
+        suggestions.precompute()
+        self.me.following.add(self.liker)  # stranger: a friend-of-friend through liker
+        self.assertStoredListCurrent(self.me)
+        self.me.following.remove(self.friend)
+        self.assertStoredListCurrent(self.me)
+        self.me.following.remove(self.liker)
+        self.assertStoredListCurrent(self.me)
+
+    def test_second_degree_changes_wait_for_the_rebuild(self):
+        suggestions.precompute()
+        before = self.stored(self.me)
+        self.friend.following.add(self.stranger)  # a friend-of-friend of me, through friend
+        self.assertEqual(self.stored(self.me), before)
+        suggestions.precompute()
+        self.assertIn((self.stranger.pk, 2), self.stored(self.me))
+
+    def test_precomputed_graph_matches_per_user_ranking(self):
+        self.assertEqual(suggestions.precompute(), 4)  # 'stranger' has no follows or likes
+        self.assertEqual(self.stored(self.me), suggestions.SocialGraph.load_for(self.me.pk).rank(self.me.pk))
+
+
+class CachedTokenAuthTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='dana', password='s3cret-pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('notification_unread_count')
+
+    def test_repeat_requests_skip_the_database(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):  # the unread counter itself
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        authentication.local_cache.clear()  # e.g. another process: served by the shared cache
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_snapshot_leaves_out_the_password_and_counters(self):
+        self.client.get(self.url)
+        snapshot = cache.get(authentication.cache_key(self.token.key))
+        self.assertEqual(snapshot['username'], 'dana')
+        self.assertFalse({'password', 'followers_count'} & set(snapshot))
+        # Counters move with bulk updates, which send no signals; they are read on access
+        User.objects.filter(pk=self.user.pk).update(followers_count=7)
+        user, _ = authentication.CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.followers_count, 7)
+        self.assertTrue(user.check_password('s3cret-pass'))
+
+    def test_profile_edit_is_seen_on_the_next_request(self):
+        self.client.get(self.url)
+        self.user.bio = 'hello'
+        self.user.save()
+        user, _ = authentication.CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(user.bio, 'hello')
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_returns_existing_token(self):
+        self.client.credentials()
+        response = self.client.post(reverse('login'), {'username': 'dana', 'password': 's3cret-pass'})
+        self.assertEqual(response.data, {'token': self.token.key, 'user_id': self.user.pk, 'username': 'dana'})
+
+
+class RegisterTests(APITestCase):
+    def test_register_creates_user_and_token_in_one_pass(self):
+        payload = {'username': 'erin', 'email': 'erin@example.com', 'password': 'long-enough-1'}
+        # username check, savepoint, user INSERT, token INSERT, release
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('register'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username='erin')
+        self.assertTrue(user.check_password('long-enough-1'))
+        self.assertEqual(response.data['token'], Token.objects.get(user=user).key)
+        self.assertNotIn('password', response.data)
+
+    def test_duplicate_username_is_rejected(self):
+        User.objects.create_user(username='erin')
+        response = self.client.post(reverse('register'), {'username': 'erin', 'password': 'long-enough-1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Token.objects.count(), 0)
+
+
+class AsyncHashingTests(APITestCase):
+    """The async register/login views with hashing done in the process pool."""
+
+    @classmethod
+    def tearDownClass(cls):
+        hashing.get_pool().shutdown()
+        super().tearDownClass()
+
+    def post(self, view, payload):
+        request = AsyncRequestFactory().post('/', payload, content_type='application/json')
+        return async_to_sync(view)(request)
+
+    def test_register_then_login(self):
+        response = self.post(views.register_async, {'username': 'fay', 'password': 'long-enough-1'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = json.loads(response.content)
+        user = User.objects.get(username='fay')
+        self.assertTrue(user.check_password('long-enough-1'))
+
+        response = self.post(views.login_async, {'username': 'fay', 'password': 'long-enough-1'})
+        self.assertEqual(json.loads(response.content)['token'], body['token'])
+        response = self.post(views.login_async, {'username': 'fay', 'password': 'wrong-password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertGreaterEqual(hashing.metrics()['completed'], 3)
+
+    def test_full_queue_answers_503(self):
+        with mock.patch.object(hashing, '_pool', hashing.HashingPool(workers=1, max_pending=0)):
+            response = self.post(views.login_async, {'username': 'nobody', 'password': 'whatever-1'})
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(hashing.metrics()['rejected'], 1)
@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from django.http import HttpResponse
-from .views import RegisterView, LoginView, FollowUserView, UnfollowUserView
+from .views import (
+    RegisterView, LoginView, FollowUserView, UnfollowUserView, FollowListView,
+    BulkFollowView, BulkUnfollowView, SuggestionListView, HashingMetricsView,
+    register_async, login_async,
+)
+
+# Hash passwords in a process pool from async views (see accounts.hashing)
+if getattr(settings, 'ACCOUNTS_ASYNC_HASHING', False):
+    register_view, login_view = register_async, login_async
+else:
+    register_view, login_view = RegisterView.as_view(), LoginView.as_view()
 
 urlpatterns = [
     # 👇 Default welcome page for /api/accounts/
@@ -12,13 +23,24 @@ urlpatterns = [
             <li><a href="login/">Login</a></li>
             <li><a href="follow/1/">Follow User (example)</a></li>
             <li><a href="unfollow/1/">Unfollow User (example)</a></li>
+            <li><a href="follow/bulk/">Follow Many Users (POST user_ids)</a></li>
+            <li><a href="unfollow/bulk/">Unfollow Many Users (POST user_ids)</a></li>
+            <li><a href="users/1/followers/">Followers of a User (example)</a></li>
+            <li><a href="users/1/following/">Users a User Follows (example)</a></li>
+            <li><a href="suggestions/">Who to Follow</a></li>
         </ul>
         """,
         content_type="text/html"
     )),
 
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
+    path('register/', register_view, name='register'),
+    path('login/', login_view, name='login'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk_follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk_unfollow'),
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow_user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow_user'),
+    path('users/<int:user_id>/followers/', FollowListView.as_view(relation='followers'), name='user_followers'),
+    path('users/<int:user_id>/following/', FollowListView.as_view(relation='following'), name='user_following'),
+    path('suggestions/', SuggestionListView.as_view(), name='follow_suggestions'),
+    path('hashing-metrics/', HashingMetricsView.as_view(), name='hashing_metrics'),
 ]
@@ -1,15 +1,25 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import generics, permissions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer
+from .serializers import UserSerializer, FollowUserSerializer, BulkFollowSerializer, SuggestionSerializer
+from . import hashing, suggestions
+from .services import register_user
+from social_media_api.pagination import KeysetPagination
 
 # For notifications
-from notifications.models import Notification
+from notifications import outbox
 
 CustomUser = get_user_model()
 
@@ -19,17 +29,20 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
     def create(self, request, *args, **kwargs):
-        resp = super().create(request, *args, **kwargs)
-        user = CustomUser.objects.get(pk=resp.data['id'])
-        token, _ = Token.objects.get_or_create(user=user)
-        return Response({**resp.data, 'token': token.key}, status=status.HTTP_201_CREATED)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        # The serializer created the token alongside the user; no re-fetch needed
+        return Response({**serializer.data, 'token': user.auth_token.key}, status=status.HTTP_201_CREATED)
 
 class LoginView(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
-        resp = super().post(request, *args, **kwargs)
-        token = resp.data['token']
-        user = Token.objects.get(key=token).user
-        return Response({'token': token, 'user_id': user.id, 'username': user.username})
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # The serializer already authenticated the user; no need to look it up again
+        user = serializer.validated_data['user']
+        token, _ = Token.objects.get_or_create(user=user)
+        return Response({'token': token.key, 'user_id': user.id, 'username': user.username})
 
 class FollowUserView(generics.GenericAPIView):
     """
@@ -43,15 +56,8 @@ class FollowUserView(generics.GenericAPIView):
         if target == request.user:
             return Response({'detail': "You can't follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
         request.user.following.add(target)
-        # create notification for the followed user
-        if target != request.user:
-            Notification.objects.create(
-                recipient=target,
-                actor=request.user,
-                verb='started following you',
-                content_type=None,
-                object_id=request.user.id
-            )
+        # queue a notification for the followed user
+        outbox.enqueue(target, request.user, 'started following you', request.user)
         return Response({'detail': f'You are now following {target.username}'}, status=status.HTTP_200_OK)
 
 class UnfollowUserView(generics.GenericAPIView):
@@ -65,3 +71,209 @@ class UnfollowUserView(generics.GenericAPIView):
         target = get_object_or_404(self.get_queryset(), pk=user_id)
         request.user.following.remove(target)
         return Response({'detail': f'You have unfollowed {target.username}'}, status=status.HTTP_200_OK)
+
+
+class BulkFollowView(generics.GenericAPIView):
+    """
+    POST {"user_ids": [...]} to follow many users at once: /api/accounts/follow/bulk/
+    One IN query validates the targets, one INSERT adds the follow rows and
+    the notifications are queued in one batch.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BulkFollowSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data['user_ids']) - {request.user.pk}
+
+        Follow = CustomUser.following.through
+        found = set(CustomUser.objects.filter(pk__in=requested, is_active=True).values_list('pk', flat=True))
+        already = set(
+            Follow.objects.filter(from_user=request.user, to_user__in=found).values_list('to_user_id', flat=True)
+        )
+        new = found - already
+
+        if new:
+            using = router.db_for_write(Follow, instance=request.user)
+            signal_kwargs = dict(
+                sender=Follow, instance=request.user, reverse=False, model=CustomUser, pk_set=new, using=using
+            )
+            with transaction.atomic(using=using):
+                m2m_changed.send(action='pre_add', **signal_kwargs)
+                Follow.objects.using(using).bulk_create(
+                    [Follow(from_user_id=request.user.pk, to_user_id=pk) for pk in new], ignore_conflicts=True
+                )
+                # Same signal Django's related manager sends, so counters and timelines stay in step
+                m2m_changed.send(action='post_add', **signal_kwargs)
+            outbox.enqueue_many((pk, request.user, 'started following you', request.user) for pk in new)
+
+        return Response({
+            'followed': sorted(new),
+            'already_following': sorted(already),
+            'not_found': sorted(requested - found),
+        }, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(generics.GenericAPIView):
+    """
+    POST {"user_ids": [...]} to unfollow many users at once: /api/accounts/unfollow/bulk/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BulkFollowSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        Follow = CustomUser.following.through
+        followed = set(
+            Follow.objects.filter(
+                from_user=request.user, to_user__in=serializer.validated_data['user_ids']
+            ).values_list('to_user_id', flat=True)
+        )
+        if followed:
+            # One DELETE ... WHERE to_user_id IN (...), with the usual m2m signals
+            request.user.following.remove(*followed)
+        return Response({'unfollowed': sorted(followed)}, status=status.HTTP_200_OK)
+
+
+class FollowPagination(KeysetPagination):
+    # Newest follow first; pages walk the follow table's (user, id) index
+    ordering = ('-id',)
+
+
+class FollowListView(generics.ListAPIView):
+    """
+    GET /api/accounts/users/<user_id>/followers/ and .../following/
+    Cursor-paginated; counts live on the user as followers_count/following_count.
+    """
+    serializer_class = FollowUserSerializer
+    pagination_class = FollowPagination
+    # 'followers': rows pointing at the user; 'following': rows the user created
+    relation = 'followers'
+
+    def get_queryset(self):
+        user = get_object_or_404(CustomUser.objects.only('pk'), pk=self.kwargs['user_id'])
+        Follow = CustomUser.following.through
+        if self.relation == 'followers':
+            return Follow.objects.filter(to_user=user).select_related('from_user')
+        return Follow.objects.filter(from_user=user).select_related('to_user')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        side = 'from_user' if self.relation == 'followers' else 'to_user'
+        serializer = self.get_serializer([getattr(row, side) for row in page], many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class SuggestionListView(generics.GenericAPIView):
+    """
+    GET who to follow: /api/accounts/suggestions/?limit=10
+    Ranked by friends-of-friends and shared likes; the ranking is read from the
+    stored suggestions (see `manage.py build_follow_graph`), then one query
+    loads the users.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SuggestionSerializer
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), self.max_limit)
+        except ValueError:
+            limit = 10
+        ranked = suggestions.suggestions_for(request.user.pk, limit=limit)
+        users = CustomUser.objects.filter(is_active=True).in_bulk([user_id for user_id, _ in ranked])
+        results = []
+        for user_id, score in ranked:
+            if user_id in users:
+                users[user_id].score = score
+                results.append(users[user_id])
+        return Response(self.get_serializer(results, many=True).data)
+
+
+# Async login/register (ACCOUNTS_ASYNC_HASHING): same request and response shapes
+# as RegisterView/LoginView, but password hashing runs in accounts.hashing's
+# process pool so the event loop keeps serving other requests meanwhile.
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    data = request.POST.copy()
+    data.update(request.FILES)
+    return data
+
+
+def _overloaded():
+    response = JsonResponse({'detail': 'Too many sign-ins in progress, try again shortly.'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+@csrf_exempt
+async def register_async(request):
+    """POST /api/accounts/register/ when ACCOUNTS_ASYNC_HASHING is on."""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+    serializer = UserSerializer(data=data, context={'request': request})
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    fields = dict(serializer.validated_data)
+    fields.pop('dummy_field', None)
+    try:
+        encoded = await hashing.make_password(fields.pop('password'))
+    except hashing.HashingOverloaded:
+        return _overloaded()
+    user = await sync_to_async(register_user)(encoded_password=encoded, **fields)
+    body = UserSerializer(user, context={'request': request}).data
+    return JsonResponse({**body, 'token': user.auth_token.key}, status=201)
+
+
+@csrf_exempt
+async def login_async(request):
+    """POST /api/accounts/login/ when ACCOUNTS_ASYNC_HASHING is on."""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+    username, password = data.get('username'), data.get('password')
+    if not username or not password:
+        return JsonResponse({'non_field_errors': ['Must include "username" and "password".']}, status=400)
+
+    user = await CustomUser.objects.filter(**{CustomUser.USERNAME_FIELD: username}).afirst()
+    upgraded = None
+    try:
+        if user is None:
+            # Spend the same time as a real check so unknown usernames can't be told apart
+            await hashing.make_password(password)
+            valid = False
+        else:
+            valid, upgraded = await hashing.verify_password(password, user.password)
+    except hashing.HashingOverloaded:
+        return _overloaded()
+    if not valid or not user.is_active:
+        return JsonResponse({'non_field_errors': ['Unable to log in with provided credentials.']}, status=400)
+
+    if upgraded:
+        # The hasher or its iteration count changed since this password was stored
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+    token, _ = await Token.objects.aget_or_create(user=user)
+    return JsonResponse({'token': token.key, 'user_id': user.id, 'username': user.username})
+
+
+class HashingMetricsView(generics.GenericAPIView):
+    """
+    GET hashing pool counters (admins only): /api/accounts/hashing-metrics/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(hashing.metrics())
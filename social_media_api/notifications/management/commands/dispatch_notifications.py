@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = "Write queued notification events to the notifications table in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the outbox instead of exiting once it is empty.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep between polls in --loop mode.")
+
+    def handle(self, *args, **options):
+        while True:
+            written = outbox.drain(options['batch_size'])
+            if written:
+                self.stdout.write(f"Dispatched {written} notification(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
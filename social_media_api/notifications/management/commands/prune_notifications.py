@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications import unread
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete notifications older than the retention period in small chunks, "
+        "so no single DELETE holds the table for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'NOTIFICATIONS_RETENTION_DAYS', 90))
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between chunks to let other writers in.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = Notification.objects.filter(timestamp__lt=cutoff).order_by('id')
+        total = 0
+        while True:
+            chunk = list(expired.values_list('id', 'recipient_id', 'unread')[:options['chunk_size']])
+            if not chunk:
+                break
+            Notification.objects.filter(pk__in=[row[0] for row in chunk]).delete()
+            for recipient_id in {row[1] for row in chunk if row[2]}:
+                unread.forget(recipient_id)
+            total += len(chunk)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {total} notification(s) older than {options['days']} day(s)."))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_recent_actors(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    for notification in Notification.objects.select_related("actor").iterator():
+        notification.recent_actors = [
+            {"id": notification.actor_id, "username": notification.actor.username}
+        ]
+        notification.save(update_fields=["recent_actors"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("notifications", "0003_notificationevent"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="actor_count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="recent_actors",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "content_type", "object_id"],
+                name="notif_group_idx",
+            ),
+        ),
+        migrations.RunPython(seed_recent_actors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("notifications", "0004_notification_aggregation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("unread", True)),
+                fields=["recipient", "unread"],
+                name="notif_unread_idx",
+            ),
+        ),
+    ]
@@ -4,6 +4,11 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
 
 class Notification(models.Model):
+    """
+    One row per (recipient, verb, target) within NOTIFICATIONS_AGGREGATION_HOURS:
+    repeated events bump `actor_count` and `recent_actors` in place
+    ("alice and 41 others liked your post").
+    """
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='actor_notifications')
     verb = models.CharField(max_length=255)
@@ -12,9 +17,69 @@ class Notification(models.Model):
     target = GenericForeignKey('content_type', 'object_id')
     timestamp = models.DateTimeField(auto_now_add=True)
     unread = models.BooleanField(default=True)
+    # `actor` is the most recent actor; `recent_actors` holds the latest few as
+    # {"id": ..., "username": ...}, newest first
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Backs keyset pagination on (timestamp, id)
+            models.Index(fields=['timestamp', 'id'], name='notif_timestamp_id_idx'),
+            # A user's notification list, newest first
+            models.Index(fields=['recipient', '-timestamp'], name='notif_recipient_recent_idx'),
+            # Finds the open aggregate for (recipient, target) when new events arrive
+            models.Index(fields=['recipient', 'content_type', 'object_id'], name='notif_group_idx'),
+            # Partial index: fallback COUNT for the unread counter
+            models.Index(fields=['recipient', 'unread'], condition=models.Q(unread=True), name='notif_unread_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.actor} {self.verb}"
+        return self.summary
+
+    @property
+    def summary(self):
+        names = [actor['username'] for actor in self.recent_actors] or [str(self.actor)]
+        if self.actor_count == 1:
+            who = names[0]
+        elif self.actor_count == 2 and len(names) == 2:
+            who = f"{names[0]} and {names[1]}"
+        else:
+            others = self.actor_count - 1
+            who = f"{names[0]} and {others} other{'s' if others != 1 else ''}"
+        return f"{who} {self.verb}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox row written on the request path. `dispatch_notifications` turns
+    batches of these into Notification rows off the hot path.
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} (pending)"
+
+
+class UnreadCounter(models.Model):
+    """
+    A user's unread notification count (see notifications.unread). Kept in the
+    database rather than the cache so the dispatch worker, the prune command and
+    every web process move the same number.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    count = models.IntegerField(default=0)
+    # When `count` was last taken from the notifications themselves
+    counted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
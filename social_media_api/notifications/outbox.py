@@ -0,0 +1,175 @@
+"""
+Notification outbox.
+
+Request handlers call enqueue()/enqueue_many(), which only insert lightweight
+NotificationEvent rows. The `dispatch_notifications` worker drains them in
+batches: events are deduplicated on (recipient, actor, verb, target) and folded
+into aggregated Notification rows (see Notification), written with one
+bulk_create plus one bulk_update per batch.
+
+Set NOTIFICATIONS_DISPATCH_INLINE = True to drain right after enqueueing
+(handy in development when no worker is running).
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import pubsub, unread
+from .models import Notification, NotificationEvent
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def enqueue(recipient, actor, verb, target):
+    """Queue one notification; users are never notified about their own actions."""
+    return enqueue_many([(recipient, actor, verb, target)])
+
+
+def enqueue_many(events):
+    """Queue (recipient, actor, verb, target) tuples with one INSERT; returns how many were queued."""
+    rows = [
+        NotificationEvent(
+            recipient_id=_pk(recipient),
+            actor_id=_pk(actor),
+            verb=verb,
+            content_type=ContentType.objects.get_for_model(target),
+            object_id=target.pk,
+        )
+        for recipient, actor, verb, target in events
+        if _pk(recipient) != _pk(actor)
+    ]
+    if rows:
+        NotificationEvent.objects.bulk_create(rows)
+        if getattr(settings, 'NOTIFICATIONS_DISPATCH_INLINE', False):
+            drain()
+    return len(rows)
+
+
+def aggregation_window():
+    return timedelta(hours=getattr(settings, 'NOTIFICATIONS_AGGREGATION_HOURS', 24))
+
+
+def recent_actor_limit():
+    return getattr(settings, 'NOTIFICATIONS_RECENT_ACTORS', 3)
+
+
+def _group_key(row):
+    return (row.recipient_id, row.verb, row.content_type_id, row.object_id)
+
+
+def _open_groups(keys, since):
+    """Latest aggregate per group key that is still inside the window (one IN query)."""
+    candidates = Notification.objects.filter(
+        recipient_id__in={key[0] for key in keys},
+        object_id__in={key[3] for key in keys},
+        timestamp__gte=since,
+    ).order_by('timestamp')
+    groups = {}
+    for notification in candidates:
+        key = _group_key(notification)
+        if key in keys:
+            groups[key] = notification
+    return groups
+
+
+def _aggregate(events):
+    """
+    Fold events into aggregated notifications. Events for the same
+    (recipient, verb, target) collapse into one row; an actor already listed in
+    recent_actors is not counted twice (older actors are only known through
+    actor_count, so a repeat from them is counted again). Returns the rows written.
+    """
+    actors_by_group = {}
+    for event in events:
+        actors = actors_by_group.setdefault(_group_key(event), [])
+        if event.actor_id in actors:
+            actors.remove(event.actor_id)
+        actors.append(event.actor_id)
+
+    now = timezone.now()
+    limit = recent_actor_limit()
+    usernames = dict(
+        get_user_model().objects.filter(
+            pk__in={actor_id for actors in actors_by_group.values() for actor_id in actors}
+        ).values_list('pk', 'username')
+    )
+    open_groups = _open_groups(actors_by_group.keys(), now - aggregation_window())
+
+    created, updated, newly_unread = [], [], Counter()
+    for key, actor_ids in actors_by_group.items():
+        notification = open_groups.get(key)
+        if notification is None:
+            recipient_id, verb, content_type_id, object_id = key
+            notification = Notification(
+                recipient_id=recipient_id, verb=verb,
+                content_type_id=content_type_id, object_id=object_id,
+                actor_count=0, recent_actors=[],
+            )
+            created.append(notification)
+        else:
+            known = {actor['id'] for actor in notification.recent_actors}
+            if not set(actor_ids) - known:
+                continue
+            updated.append(notification)
+        if notification.pk is None or not notification.unread:
+            newly_unread[notification.recipient_id] += 1
+
+        recent = notification.recent_actors
+        for actor_id in actor_ids:
+            if actor_id not in {actor['id'] for actor in recent}:
+                notification.actor_count += 1
+            recent = [actor for actor in recent if actor['id'] != actor_id]
+            recent.insert(0, {'id': actor_id, 'username': usernames.get(actor_id, '')})
+        notification.recent_actors = recent[:limit]
+        notification.actor_id = actor_ids[-1]
+        notification.unread = True
+        notification.timestamp = now
+
+    Notification.objects.bulk_create(created)
+    Notification.objects.bulk_update(updated, ['actor', 'actor_count', 'recent_actors', 'unread', 'timestamp'])
+    written = created + updated
+    transaction.on_commit(lambda: _after_commit(newly_unread, {n.recipient_id for n in written}))
+    return written
+
+
+def _after_commit(newly_unread, recipient_ids):
+    for user_id, count in newly_unread.items():
+        unread.adjust(user_id, count)
+    # Wake any open notification streams of these recipients
+    pubsub.publish(recipient_ids)
+
+
+def drain_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Fold up to `batch_size` queued events into notifications.
+    Returns (events consumed, notifications created or updated).
+    """
+    with transaction.atomic():
+        events = NotificationEvent.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        events = list(events[:batch_size])
+        if not events:
+            return 0, 0
+        written = _aggregate(events)
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events), len(written)
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE):
+    """Drain the outbox until it is empty; returns the number of notifications created or updated."""
+    written = 0
+    while True:
+        consumed, created = drain_batch(batch_size)
+        written += created
+        if consumed < batch_size:
+            return written
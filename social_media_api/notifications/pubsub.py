@@ -0,0 +1,85 @@
+"""
+Wake-up channel for the notification stream.
+
+The outbox worker publishes the ids of users whose notifications changed and
+open stream connections for those users wake up and read the new rows. The
+default broker lives in process memory, which covers a single ASGI process
+(or NOTIFICATIONS_DISPATCH_INLINE in that process); other processes are still
+served by the stream's periodic poll. NOTIFICATIONS_PUBSUB_BACKEND can point
+at another class with the same subscribe/unsubscribe/publish interface, e.g.
+one backed by Redis pub/sub.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """True if woken by a publish, False on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids):
+        with self._lock:
+            targets = [sub for user_id in user_ids for sub in self._subscriptions.get(user_id, ())]
+        for subscription in targets:
+            try:
+                subscription.notify()
+            except RuntimeError:
+                # The subscriber's event loop has already shut down
+                self.unsubscribe(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'NOTIFICATIONS_PUBSUB_BACKEND', 'notifications.pubsub.InMemoryBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(user_ids):
+    if user_ids:
+        get_broker().publish(set(user_ids))
@@ -6,7 +6,24 @@ class NotificationSerializer(serializers.ModelSerializer):
     recipient = serializers.ReadOnlyField(source='recipient.username')
     target_id = serializers.IntegerField(source='object_id', read_only=True)
     target_type = serializers.CharField(source='content_type.model', read_only=True)
+    recent_actors = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
-        fields = ['id', 'recipient', 'actor', 'verb', 'target_type', 'target_id', 'timestamp', 'unread']
+        fields = [
+            'id', 'recipient', 'actor', 'verb', 'target_type', 'target_id', 'timestamp', 'unread',
+            'actor_count', 'recent_actors', 'summary',
+        ]
+
+    def get_recent_actors(self, obj):
+        return [actor['username'] for actor in obj.recent_actors]
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Which notifications to mark read: by id, up to a timestamp, or (neither) all of them."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    before = serializers.DateTimeField(required=False)
+
+
+class PurgeSerializer(serializers.Serializer):
+    older_than_days = serializers.IntegerField(min_value=0)
@@ -1,3 +1,298 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+from . import outbox, pubsub
+from .models import Notification, NotificationEvent, UnreadCounter
+
+User = get_user_model()
+
+
+class NotificationListTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.actor = User.objects.create_user(username='actor')
+        for _ in range(3):
+            Notification.objects.create(
+                recipient=self.recipient, actor=self.actor, verb='started following you', target=self.actor
+            )
+        self.client.force_authenticate(user=self.recipient)
+
+    def test_list_is_keyset_paginated(self):
+        response = self.client.get(reverse('notification_list') + '?page_size=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 2)
+
+        rest = self.client.get(response.data['next']).data
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+        ids = [n['id'] for n in response.data['results'] + rest['results']]
+        self.assertEqual(ids, list(Notification.objects.order_by('-timestamp', '-id').values_list('id', flat=True)))
+
+
+class NotificationOutboxTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='body')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_is_queued_then_dispatched_once(self):
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.client.post(reverse('post-unlike', args=[self.post.pk]))
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+
+        call_command('dispatch_notifications', stdout=StringIO())
+        self.assertFalse(NotificationEvent.objects.exists())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor), (self.author, self.fan))
+        self.assertEqual(notification.target, self.post)
+
+        # A later repeat of the same event is still deduplicated against stored rows
+        outbox.enqueue(self.author, self.fan, 'liked your post', self.post)
+        outbox.drain()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_own_actions_are_not_queued(self):
+        self.client.force_authenticate(user=self.author)
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_follow_and_comment_notifications(self):
+        self.client.post(reverse('follow_user', args=[self.author.pk]))
+        url = reverse('post-comments', args=[self.post.pk])
+        self.client.post(url, {'post': self.post.pk, 'content': 'hi'}, format='json')
+        outbox.drain()
+        verbs = set(Notification.objects.filter(recipient=self.author).values_list('verb', flat=True))
+        self.assertEqual(verbs, {'started following you', 'commented on your post'})
+
+    @override_settings(NOTIFICATIONS_DISPATCH_INLINE=True)
+    def test_inline_mode_writes_immediately(self):
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+
+class NotificationAggregationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, title='Popular', content='body')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(5)]
+
+    def like(self, fan):
+        outbox.enqueue(self.author, fan, 'liked your post', self.post)
+
+    def test_likes_collapse_into_one_row(self):
+        for fan in self.fans:
+            self.like(fan)
+        outbox.drain()
+        self.like(self.fans[3])  # duplicate of a listed actor: dropped
+        outbox.drain(batch_size=2)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actor, self.fans[4])
+        self.assertEqual([a['username'] for a in notification.recent_actors], ['fan4', 'fan3', 'fan2'])
+        self.assertEqual(notification.summary, 'fan4 and 4 others liked your post')
+
+        self.client.force_authenticate(user=self.author)
+        data = self.client.get(reverse('notification_list')).data['results']
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['actor_count'], 5)
+        self.assertEqual(data[0]['recent_actors'], ['fan4', 'fan3', 'fan2'])
+
+    def test_new_activity_reopens_a_read_group(self):
+        self.like(self.fans[0])
+        outbox.drain()
+        Notification.objects.update(unread=False)
+        self.like(self.fans[1])
+        outbox.drain()
+        notification = Notification.objects.get()
+        self.assertTrue(notification.unread)
+        self.assertEqual(notification.summary, 'fan1 and fan0 liked your post')
+
+    def test_events_outside_the_window_start_a_new_group(self):
+        self.like(self.fans[0])
+        outbox.drain()
+        Notification.objects.update(timestamp=timezone.now() - timedelta(days=2))
+        self.like(self.fans[1])
+        outbox.drain()
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class UnreadCountTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='body')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(2)]
+        self.client.force_authenticate(user=self.author)
+
+    def deliver(self, fan, verb):
+        outbox.enqueue(self.author, fan, verb, self.post)
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.drain()
+
+    def unread_count(self):
+        response = self.client.get(reverse('notification_unread_count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['unread_count']
+
+    def test_counter_follows_creation_and_mark_read(self):
+        self.assertEqual(self.unread_count(), 0)
+        self.deliver(self.fans[0], 'liked your post')
+        self.deliver(self.fans[0], 'commented on your post')
+        self.deliver(self.fans[1], 'liked your post')  # folds into the existing unread row
+        self.assertEqual(self.unread_count(), 2)
+
+        response = self.client.post(reverse('notification_mark_read'))
+        self.assertEqual(response.data['marked_read'], 2)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.filter(unread=True).exists())
+
+        self.deliver(User.objects.create_user(username='late'), 'liked your post')  # reopens the read group
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_warm_counter_needs_no_notification_query(self):
+        self.unread_count()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(any('notifications_notification' in q['sql'] for q in queries))
+
+    def test_expired_counter_is_recounted(self):
+        self.assertEqual(self.unread_count(), 0)
+        # Written behind the counter's back, e.g. by a raw UPDATE
+        Notification.objects.create(recipient=self.author, actor=self.fans[0], verb='liked your post', target=self.post)
+        self.assertEqual(self.unread_count(), 0)
+        UnreadCounter.objects.update(counted_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.unread_count(), 1)
+
+
+class BulkNotificationTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.actors = [User.objects.create_user(username=f'actor{i}') for i in range(4)]
+        self.notifications = [
+            Notification.objects.create(recipient=self.recipient, actor=actor, verb='started following you', target=actor)
+            for actor in self.actors
+        ]
+        old = timezone.now() - timedelta(days=30)
+        Notification.objects.filter(pk__in=[n.pk for n in self.notifications[:2]]).update(timestamp=old)
+        self.client.force_authenticate(user=self.recipient)
+
+    def test_mark_read_by_ids(self):
+        ids = [self.notifications[0].pk, self.notifications[3].pk]
+        with self.assertNumQueries(6):  # the UPDATE, the counter adjust and read, then seeding it: COUNT, UPDATE, INSERT
+            response = self.client.post(reverse('notification_mark_read'), {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'marked_read': 2, 'unread_count': 2})
+        self.assertEqual(set(Notification.objects.filter(unread=False).values_list('pk', flat=True)), set(ids))
+
+    def test_mark_read_before_timestamp(self):
+        before = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.post(reverse('notification_mark_read'), {'before': before}, format='json')
+        self.assertEqual(response.data['marked_read'], 2)
+        self.assertEqual(self.client.get(reverse('notification_unread_count')).data['unread_count'], 2)
+
+    def test_purge_older_than(self):
+        other = User.objects.create_user(username='other')
+        Notification.objects.create(recipient=other, actor=self.actors[0], verb='started following you', target=self.actors[0])
+        Notification.objects.filter(recipient=other).update(timestamp=timezone.now() - timedelta(days=30))
+
+        response = self.client.post(reverse('notification_purge'), {'older_than_days': 7}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(Notification.objects.filter(recipient=self.recipient).count(), 2)
+        self.assertTrue(Notification.objects.filter(recipient=other).exists())
+
+    def test_invalid_payload(self):
+        response = self.client.post(reverse('notification_purge'), {'older_than_days': -1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_command_deletes_in_chunks(self):
+        call_command('prune_notifications', days=7, chunk_size=1, stdout=StringIO())
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('notification_unread_count')).data['unread_count'], 2)
+
+
+class NotificationStreamTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.actor = User.objects.create_user(username='actor')
+        self.token = Token.objects.create(user=self.recipient)
+
+    def test_requires_authentication(self):
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_stream_resumes_from_last_event_id(self):
+        await Notification.objects.acreate(
+            recipient=self.recipient, actor=self.actor, verb='started following you',
+            content_type=await sync_to_async(ContentType.objects.get_for_model)(User), object_id=self.actor.pk,
+        )
+        response = await self.async_client.get(
+            reverse('notification_stream'),
+            headers={'Authorization': f'Token {self.token.key}', 'Last-Event-ID': '2000-01-01T00:00:00+00:00'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+        first = (await anext(chunks)).decode()
+        await chunks.aclose()
+        self.assertIn('event: notification', first)
+        self.assertIn('"verb": "started following you"', first)
+
+    async def test_stream_resumes_within_a_shared_timestamp(self):
+        # A drain batch stamps every notification it writes with the same time
+        content_type = await sync_to_async(ContentType.objects.get_for_model)(User)
+        first, second = [
+            await Notification.objects.acreate(
+                recipient=self.recipient, actor=self.actor, verb=verb, content_type=content_type, object_id=self.actor.pk,
+            )
+            for verb in ('liked your post', 'commented on your post')
+        ]
+        now = timezone.now()
+        await Notification.objects.filter(recipient=self.recipient).aupdate(timestamp=now)
+        response = await self.async_client.get(
+            reverse('notification_stream'),
+            headers={'Authorization': f'Token {self.token.key}', 'Last-Event-ID': f'{now.isoformat()}/{first.pk}'},
+        )
+        chunks = response.streaming_content
+        event = (await anext(chunks)).decode()
+        await chunks.aclose()
+        self.assertIn(f'id: {now.isoformat()}/{second.pk}', event)
+        self.assertIn('"verb": "commented on your post"', event)
+
+    def test_impossible_last_event_id_starts_from_now(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.get(reverse('notification_stream'), HTTP_LAST_EVENT_ID='2024-02-30T00:00:00')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+
+
+class InMemoryBrokerTests(SimpleTestCase):
+    def test_publish_wakes_only_matching_subscribers(self):
+        async def scenario():
+            broker = pubsub.InMemoryBroker()
+            mine, other = broker.subscribe(1), broker.subscribe(2)
+            broker.publish({1})
+            woke = await mine.wait(1), await other.wait(0.01)
+            broker.unsubscribe(mine)
+            broker.unsubscribe(other)
+            broker.publish({1, 2})
+            return woke
+
+        self.assertEqual(asyncio.run(scenario()), (True, False))
@@ -0,0 +1,48 @@
+"""
+Per-user unread notification counter, one UnreadCounter row per user.
+
+The outbox worker bumps the counter when a notification is created or a read
+one comes back to life; mark-read actions lower or reset it. The row lives in
+the database, so those writes reach every process that serves the count. A
+missing or expired row falls back to a COUNT served by the partial
+(recipient, unread) index and is re-seeded, and NOTIFICATIONS_UNREAD_TTL bounds
+how long any drift can survive (a notification committed while the row is
+being seeded is the one case an increment can miss).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification, UnreadCounter
+
+
+def _ttl():
+    return getattr(settings, 'NOTIFICATIONS_UNREAD_TTL', 24 * 60 * 60)
+
+
+def unread_count(user_id):
+    fresh_since = timezone.now() - timedelta(seconds=_ttl())
+    count = UnreadCounter.objects.filter(pk=user_id, counted_at__gt=fresh_since).values_list('count', flat=True).first()
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, unread=True).count()
+        reset(user_id, count)
+    return max(count, 0)
+
+
+def adjust(user_id, delta):
+    """Shift a stored counter; a missing counter is simply recomputed on the next read."""
+    if not delta:
+        return
+    UnreadCounter.objects.filter(pk=user_id).update(count=F('count') + delta)
+
+
+def reset(user_id, count=0):
+    values = {'count': count, 'counted_at': timezone.now()}
+    if not UnreadCounter.objects.filter(pk=user_id).update(**values):
+        UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id, **values)], ignore_conflicts=True)
+
+
+def forget(user_id):
+    UnreadCounter.objects.filter(pk=user_id).delete()
@@ -1,18 +1,26 @@
 from django.urls import path
 from django.http import HttpResponse
-from .views import NotificationListView
+from .views import NotificationListView, UnreadCountView, MarkReadView, PurgeView, notification_stream
 
 urlpatterns = [
-    # 👇 Default page for /api/notifications/
-    path('', lambda request: HttpResponse(
+    path('', NotificationListView.as_view(), name='notification_list'),
+    path('unread-count/', UnreadCountView.as_view(), name='notification_unread_count'),
+    path('mark-read/', MarkReadView.as_view(), name='notification_mark_read'),
+    path('purge/', PurgeView.as_view(), name='notification_purge'),
+    path('stream/', notification_stream, name='notification_stream'),
+
+    # 👇 Endpoint overview (used to sit at '' and shadowed the list view)
+    path('endpoints/', lambda request: HttpResponse(
         """
         <h2>Notifications API Endpoints</h2>
         <ul>
-            <li><a href="">List Notifications (GET)</a></li>
+            <li><a href="../">List Notifications (GET)</a></li>
+            <li><a href="../unread-count/">Unread Count (GET)</a></li>
+            <li><a href="../mark-read/">Mark Read: all, by ids or before a timestamp (POST)</a></li>
+            <li><a href="../purge/">Purge Older Than N Days (POST)</a></li>
+            <li><a href="../stream/">Live Stream (server-sent events)</a></li>
         </ul>
         """,
         content_type="text/html"
     )),
-
-    path('', NotificationListView.as_view(), name='notification_list'),
 ]
@@ -1,10 +1,171 @@
-from rest_framework import generics, permissions
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from . import pubsub, unread
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, MarkReadSerializer, PurgeSerializer
+from social_media_api.pagination import KeysetPagination
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related('actor', 'recipient', 'content_type')
+
+
+class UnreadCountView(APIView):
+    """
+    GET /api/notifications/unread-count/
+    O(1): a primary-key read of the user's UnreadCounter row (notifications/unread.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'unread_count': unread.unread_count(request.user.pk)})
+
+
+class MarkReadView(APIView):
+    """
+    POST /api/notifications/mark-read/
+    Body: {} for all, {"ids": [...]} or {"before": "<ISO timestamp>"}.
+    Runs as a single UPDATE.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids')
+        before = serializer.validated_data.get('before')
+
+        qs = Notification.objects.filter(recipient=request.user, unread=True)
+        if ids is not None:
+            qs = qs.filter(pk__in=ids)
+        if before is not None:
+            qs = qs.filter(timestamp__lte=before)
+        marked = qs.update(unread=False)
+
+        if ids is None and before is None:
+            unread.reset(request.user.pk)
+        else:
+            unread.adjust(request.user.pk, -marked)
+        return Response(
+            {'marked_read': marked, 'unread_count': unread.unread_count(request.user.pk)},
+            status=status.HTTP_200_OK,
+        )
+
+
+class PurgeView(APIView):
+    """
+    POST /api/notifications/purge/
+    Body: {"older_than_days": N}. Deletes in a single DELETE.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = PurgeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cutoff = timezone.now() - timedelta(days=serializer.validated_data['older_than_days'])
+        deleted, _ = Notification.objects.filter(recipient=request.user, timestamp__lt=cutoff).delete()
+        if deleted:
+            unread.forget(request.user.pk)
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+
+def _stream_user(request):
+    """Authenticate with the same classes as the REST API (token or session)."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+STREAM_BATCH = 100
+
+
+def _resume_point(last_event_id):
+    """
+    (timestamp, id) to resume after, from a Last-Event-ID of the form
+    '<ISO timestamp>/<id>'. A missing or unparseable header (including a
+    well-formed but impossible date) starts from now.
+    """
+    timestamp, _, pk = last_event_id.partition('/')
+    try:
+        since = parse_datetime(timestamp)
+    except ValueError:
+        since = None
+    if since is None:
+        return timezone.now(), 0
+    return since, int(pk) if pk.isdigit() else 0
+
+
+def _changed_since(user_id, since, last_id):
+    # Resume on (timestamp, id): a drain batch stamps all its notifications
+    # with the same time, so the timestamp alone can't mark a position
+    rows = (
+        Notification.objects.filter(recipient_id=user_id)
+        .filter(Q(timestamp__gt=since) | Q(timestamp=since, id__gt=last_id))
+        .select_related('actor', 'recipient', 'content_type')
+        .order_by('timestamp', 'id')[:STREAM_BATCH]
+    )
+    return [(n.timestamp, n.pk, NotificationSerializer(n).data) for n in rows]
+
+
+async def _event_stream(user_id, since, last_id):
+    poll = getattr(settings, 'NOTIFICATIONS_STREAM_POLL_SECONDS', 15)
+    lifetime = getattr(settings, 'NOTIFICATIONS_STREAM_MAX_SECONDS', 300)
+    deadline = timezone.now() + timedelta(seconds=lifetime)
+    broker = pubsub.get_broker()
+    subscription = broker.subscribe(user_id)
+    try:
+        while True:
+            changes = await sync_to_async(_changed_since)(user_id, since, last_id)
+            for since, last_id, data in changes:
+                yield f"id: {since.isoformat()}/{last_id}\nevent: notification\ndata: {json.dumps(data, default=str)}\n\n"
+            if timezone.now() >= deadline:
+                # Clients reconnect with Last-Event-ID and resume where they left off
+                return
+            if len(changes) == STREAM_BATCH:
+                # More are already waiting
+                continue
+            if not await subscription.wait(poll):
+                yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """
+    GET /api/notifications/stream/
+    Server-sent events: pushes new or updated notifications as they are
+    written. Resumes from the Last-Event-ID header ('<ISO timestamp>/<id>')
+    when a client reconnects. Serve under ASGI so open streams don't pin threads.
+    """
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    since, last_id = _resume_point(request.headers.get('Last-Event-ID', ''))
+    response = StreamingHttpResponse(_event_stream(user.pk, since, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -6,3 +6,7 @@ class PostsConfig(AppConfig):
 
     def ready(self):
         import posts.signals
+        from social_media_api import response_cache
+        from .views import CommentViewSet, PostViewSet
+        response_cache.connect_view(PostViewSet)
+        response_cache.connect_view(CommentViewSet)
@@ -0,0 +1,178 @@
+"""
+Denormalized engagement counters on Post.
+
+Like and comment writes adjust Post.likes_count / Post.comments_count with a
+single UPDATE using F() expressions, so concurrent writers never read-modify-
+write the row. The same UPDATE moves the post's trending score (see
+posts.trending). `reconcile_post_counters` repairs any drift in the counts.
+UPDATEs send no post_save, so cached Post responses are invalidated here.
+
+With POSTS_BUFFER_LIKE_COUNTS, likes go through `adjust_likes`, which only
+inserts a LikeCountDelta row next to the Like row, in the same transaction.
+`flush` drains those rows in id order, whichever process wrote them, and
+writes each batch in one UPDATE ... SET likes_count = likes_count + CASE ...
+statement. It runs at most POSTS_LIKE_FLUSH_SECONDS after a buffered like
+commits, and before the maintenance commands recount. A like storm on one
+post then costs one counter write per interval instead of one per request,
+and the displayed count lags by at most that interval. Counts are clamped at
+0: a post's net delta can only be negative when the likes it takes back were
+already flushed, but a drifted count must not make the UPDATE fail.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from social_media_api import response_cache
+
+from . import trending
+from .models import Comment, Like, LikeCountDelta, Post
+
+
+def adjust_counts(post_id, likes=0, comments=0, at=None, events=None):
+    """
+    Atomically add `likes` / `comments` (may be negative) to a post's counters.
+    `at` is when the like/comment was made (default now); pass the original
+    time when removing one so its exact trending contribution is taken back.
+    `events` overrides the trending change with trending.event() tuples, for
+    events made at different times.
+    """
+    changes = {}
+    if likes:
+        changes['likes_count'] = F('likes_count') + likes
+    if comments:
+        changes['comments_count'] = F('comments_count') + comments
+    if changes:
+        added, removed = trending.score_change(events or [trending.event(likes, comments, at)])
+        changes['hot_score'] = trending.updated_score(F('hot_score'), added, removed)
+        Post.objects.filter(pk=post_id).update(**changes)
+        response_cache.invalidate(Post)
+
+
+def buffering_likes():
+    return getattr(settings, 'POSTS_BUFFER_LIKE_COUNTS', False)
+
+
+def flush_interval():
+    return getattr(settings, 'POSTS_LIKE_FLUSH_SECONDS', 5)
+
+
+class FlushTimer:
+    """Runs one flush() POSTS_LIKE_FLUSH_SECONDS after the first like buffered since the last one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(flush_interval(), self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._timer = None
+        try:
+            flush()
+        finally:
+            connection.close()
+
+
+flush_timer = FlushTimer()
+
+
+def adjust_likes(post_id, likes, at=None):
+    """Add `likes` to a post now, or queue it when POSTS_BUFFER_LIKE_COUNTS is on."""
+    if not buffering_likes():
+        return adjust_counts(post_id, likes=likes, at=at)
+    LikeCountDelta.objects.create(post_id=post_id, likes=likes, created_at=at or timezone.now())
+    transaction.on_commit(flush_timer.schedule)
+
+
+def flush_batch(batch_size=500):
+    """Apply up to `batch_size` queued like deltas; returns (deltas applied, posts updated)."""
+    with transaction.atomic():
+        deltas = LikeCountDelta.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            deltas = deltas.select_for_update(skip_locked=True)
+        deltas = list(deltas.values_list('pk', 'post_id', 'likes', 'created_at')[:batch_size])
+        if not deltas:
+            return 0, 0
+        pending = defaultdict(lambda: [0, []])
+        for _, post_id, likes, created_at in deltas:
+            pending[post_id][0] += likes
+            pending[post_id][1].append(trending.event(likes=likes, at=created_at))
+        changes = {pk: trending.score_change(events) for pk, (_, events) in pending.items()}
+
+        def per_post(values, default, output_field):
+            return Case(*[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+                        default=Value(default), output_field=output_field)
+
+        likes = per_post({pk: n for pk, (n, _) in pending.items()}, 0, IntegerField())
+        added = per_post({pk: change[0] for pk, change in changes.items()}, trending.NOTHING, FloatField())
+        removed = per_post({pk: change[1] for pk, change in changes.items()}, trending.NOTHING, FloatField())
+        Post.objects.filter(pk__in=list(pending)).update(
+            likes_count=Greatest(F('likes_count') + likes, Value(0)),
+            hot_score=trending.updated_score(F('hot_score'), added, removed),
+        )
+        LikeCountDelta.objects.filter(pk__in=[delta[0] for delta in deltas]).delete()
+    response_cache.invalidate(Post)
+    return len(deltas), len(pending)
+
+
+def flush(batch_size=500):
+    """Drain the like delta queue; returns the number of post updates written."""
+    updated = 0
+    while True:
+        applied, posts = flush_batch(batch_size)
+        updated += posts
+        if applied < batch_size:
+            return updated
+
+
+def _per_post(queryset, total):
+    """Correlated subquery: `total` over the rows of `queryset` belonging to the outer post (0 if none)."""
+    rows = queryset.filter(post=OuterRef('pk')).order_by().values('post')
+    return Coalesce(Subquery(rows.annotate(total=total).values('total')), 0)
+
+
+def _actual_counts():
+    return {
+        # Queued deltas are already in the Like table but not yet in likes_count
+        'likes_count': _per_post(Like.objects, Count('pk')) - _per_post(LikeCountDelta.objects, Sum('likes')),
+        'comments_count': _per_post(Comment.objects, Count('pk')),
+    }
+
+
+def drifted_posts():
+    """Posts whose stored counters disagree with the Like/Comment tables (net of queued like deltas)."""
+    actual = {f'actual_{name}': value for name, value in _actual_counts().items()}
+    return (
+        Post.objects.annotate(**actual)
+        .exclude(likes_count=F('actual_likes_count'), comments_count=F('actual_comments_count'))
+        .values_list('pk', flat=True)
+    )
+
+
+def reconcile():
+    """Rewrite drifted counters from the source tables; returns the number fixed."""
+    fixed = 0
+    for post_id in drifted_posts().iterator():
+        # Recount in the UPDATE itself, so deltas flushed since the check aren't counted twice
+        Post.objects.filter(pk=post_id).update(**_actual_counts())
+        fixed += 1
+    if fixed:
+        response_cache.invalidate(Post)
+    return fixed
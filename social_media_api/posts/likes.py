@@ -0,0 +1,93 @@
+"""
+Like / unlike as single idempotent statements.
+
+`add` is one INSERT INTO posts_like ... SELECT ... FROM posts_post WHERE
+id = %s using the backend's ignore-conflicts form (ON CONFLICT DO NOTHING,
+INSERT OR IGNORE, INSERT IGNORE), as bulk_create(ignore_conflicts=True)
+does. The unique (post, user) constraint picks the winner of a race, and
+the SELECT inserts nothing for a missing post, so the post is never read
+first. The rowcount tells whether this call created the like; if it did,
+its created_at is returned so the trending score can use the exact time
+that `remove` will later take back.
+
+`remove` is a DELETE filtered on (user, post). On databases with RETURNING
+it hands back the deleted row's created_at in the same statement, so the
+like's exact trending contribution can be taken back. The rowcount again
+decides who removed it.
+
+The post is looked up only when nothing was inserted or deleted, to tell
+"already (un)liked" from a post that doesn't exist.
+"""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Like, Post
+
+
+def _quote(model, field_name):
+    return connection.ops.quote_name(model._meta.get_field(field_name).column)
+
+
+def _ensure_post(post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Post.DoesNotExist(f'No post with id {post_id}')
+
+
+def _to_datetime(value):
+    # SQLite hands raw RETURNING values back as text
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def add(user_id, post_id):
+    """Like a post; the new like's created_at, or None if it existed. Raises Post.DoesNotExist."""
+    fields = [Like._meta.get_field(name) for name in ('post', 'user', 'created_at')]
+    now = timezone.now()
+    created_at = fields[2].get_db_prep_value(now, connection)
+    post_pk = _quote(Post, Post._meta.pk.name)
+    sql = (
+        f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+        f"{connection.ops.quote_name(Like._meta.db_table)} "
+        f"({', '.join(connection.ops.quote_name(field.column) for field in fields)}) "
+        f"SELECT {post_pk}, %s, %s FROM {connection.ops.quote_name(Post._meta.db_table)} WHERE {post_pk} = %s "
+        f"{connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, created_at, post_id])
+        created = cursor.rowcount == 1
+    if not created:
+        _ensure_post(post_id)
+        return None
+    return now
+
+
+def remove(user_id, post_id):
+    """Unlike a post; the removed like's created_at, or None if there was none. Raises Post.DoesNotExist."""
+    likes = Like.objects.filter(user_id=user_id, post_id=post_id)
+    # Backends that can return rows from INSERT also support DELETE ... RETURNING
+    if connection.features.can_return_rows_from_bulk_insert:
+        sql = (
+            f"DELETE FROM {connection.ops.quote_name(Like._meta.db_table)} "
+            f"WHERE {_quote(Like, 'user')} = %s AND {_quote(Like, 'post')} = %s "
+            f"RETURNING {_quote(Like, 'created_at')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, post_id])
+            row = cursor.fetchone()
+        created_at = _to_datetime(row[0]) if row else None
+    else:
+        created_at = likes.values_list('created_at', flat=True).first()
+        if created_at is not None and not likes.delete()[0]:
+            # Someone else removed it between the two statements
+            created_at = None
+    if created_at is None:
+        _ensure_post(post_id)
+    return created_at
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract hashtags and mentions for existing posts. Does not count towards "
+        "trending tags and sends no mention notifications."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('pk', 'author_id', 'title', 'content', 'created_at').order_by('pk')
+        total = 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            tags.sync_hashtags(post, created=False, count_uses=False)
+            tags.sync_mentions(post, created=False, notify=False)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} post(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Post.hot_score from like/comment timestamps, e.g. after moving "
+        "POSTS_TRENDING_EPOCH or changing the half-life."
+    )
+
+    def handle(self, *args, **options):
+        # Scores are rebuilt from the Like rows, so pending buffered deltas must land first
+        counters.flush()
+        scored = trending.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} post(s)."))
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        # Other databases use posts.search.LikeSearchBackend or a configured backend
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(title, content, created UNINDEXED)'
+            )
+        except Exception:
+            # SQLite built without FTS5: search falls back to LIKE
+            return
+        Post = apps.get_model('posts', 'Post')
+        rows = (
+            (pk, title, content, created_at.timestamp())
+            for pk, title, content, created_at in Post.objects.values_list('pk', 'title', 'content', 'created_at').iterator()
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, content, created) VALUES (%s, %s, %s, %s)', list(rows)
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0004_post_created_id_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
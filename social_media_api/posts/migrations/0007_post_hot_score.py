@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_hot_scores(apps, schema_editor):
+    # Scores are computed by 0013_hot_score_log_space; the linear forward-decay
+    # sums first written here overflow once events are ~1000 half-lives past
+    # the epoch
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0006_hashtags_mentions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="hot_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["hot_score", "id"], name="posts_post_hot_score_idx"
+            ),
+        ),
+        migrations.RunPython(populate_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    # Existing comments are all top level: their path is their own zero-padded id
+    # (posts.threads.PATH_DIGITS at the time of writing)
+    Comment = apps.get_model("posts", "Comment")
+    batch = []
+    for pk in Comment.objects.order_by("pk").values_list("pk", flat=True).iterator():
+        batch.append(Comment(pk=pk, path=f"{pk:010d}"))
+        if len(batch) == 500:
+            Comment.objects.bulk_update(batch, ["path"])
+            batch = []
+    Comment.objects.bulk_update(batch, ["path"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0008_social_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="posts.comment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "parent", "path"], name="posts_comment_thread_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["path"], name="posts_comment_path_idx"),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_read_fanout_posts(apps, schema_editor):
+    # Posts by authors over the threshold were never copied into timelines
+    Post = apps.get_model("posts", "Post")
+    threshold = getattr(settings, "POSTS_FANOUT_THRESHOLD", 1000)
+    Post.objects.filter(author__followers_count__gte=threshold).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_user_follow_counts"),
+        ("posts", "0010_timeline_page_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="fanned_out",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanned_out", False)),
+                fields=["author", "-created_at"],
+                name="posts_post_read_fanout_idx",
+            ),
+        ),
+        migrations.RunPython(mark_read_fanout_posts, migrations.RunPython.noop),
+    ]
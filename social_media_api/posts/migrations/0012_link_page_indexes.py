@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0011_post_fanned_out"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="mention",
+            name="posts_mention_user_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="posthashtag",
+            name="posts_hashtag_recent_idx",
+        ),
+        migrations.AddIndex(
+            model_name="mention",
+            index=models.Index(
+                fields=["user", "-created_at", "-post"], name="posts_mention_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="posthashtag",
+            index=models.Index(
+                fields=["hashtag", "-created_at", "-post"],
+                name="posts_hashtag_recent_idx",
+            ),
+        ),
+    ]
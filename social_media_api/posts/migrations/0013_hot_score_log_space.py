@@ -0,0 +1,41 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations
+
+
+def log_space_hot_scores(apps, schema_editor):
+    # Same formula as posts.trending at the time of writing: hot_score is
+    # log2(1 + sum of weight * 2 ** half-lives since the epoch), summed in log space
+    Post = apps.get_model("posts", "Post")
+    Like = apps.get_model("posts", "Like")
+    Comment = apps.get_model("posts", "Comment")
+    epoch = getattr(settings, "POSTS_TRENDING_EPOCH", datetime(2025, 1, 1, tzinfo=timezone.utc))
+    half_life = getattr(settings, "POSTS_TRENDING_HALF_LIFE_HOURS", 24)
+
+    terms = defaultdict(lambda: [0.0])  # the 1 in 1 + sum
+    for model, weight in ((Like, 1.0), (Comment, 2.0)):
+        for post_id, created_at in model.objects.values_list("post_id", "created_at").iterator():
+            terms[post_id].append(math.log2(weight) + (created_at - epoch).total_seconds() / 3600 / half_life)
+
+    def log_sum(values):
+        top = max(values)
+        return top + math.log2(sum(2 ** (value - top) for value in values))
+
+    Post.objects.exclude(hot_score=0).update(hot_score=0)
+    Post.objects.bulk_update(
+        [Post(pk=pk, hot_score=log_sum(values)) for pk, values in terms.items()], ["hot_score"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0012_link_page_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(log_space_hot_scores, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,87 @@
 from django.db import models
 from django.conf import settings
 
+def comment_preview_limit():
+    return getattr(settings, 'POSTS_COMMENT_PREVIEW', 5)
+
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Shared prefetch plan for anything serialized with PostSerializer:
+        post authors are joined in, and only the latest POSTS_COMMENT_PREVIEW
+        comments per post are prefetched together with their authors.
+        """
+        comments = Comment.objects.select_related('author').order_by('-created_at', '-id')[:comment_preview_limit()]
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('comments', queryset=comments, to_attr='_comment_preview')
+        )
+
 class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept current by posts.counters
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Forward-decayed engagement score, maintained with the counters (posts.trending)
+    hot_score = models.FloatField(default=0)
+    # False when the author was over POSTS_FANOUT_THRESHOLD at posting time:
+    # the post lives in no timeline and feeds read it from the author's posts
+    fanned_out = models.BooleanField(default=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='posts_post_created_id_idx'),
+            # Top-N trending posts is a short read from the top of this index
+            models.Index(fields=['hot_score', 'id'], name='posts_post_hot_score_idx'),
+            # An author's posts newest first (timeline backfill, profile pages)
+            models.Index(fields=['author', '-created_at'], name='posts_post_author_recent_idx'),
+            # Posts read into feeds on demand, per author, newest first
+            models.Index(
+                fields=['author', '-created_at'], name='posts_post_read_fanout_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.author.username}"
 
+    @property
+    def comment_preview(self):
+        """Latest comments, from the with_related() prefetch when available."""
+        if hasattr(self, '_comment_preview'):
+            return self._comment_preview
+        return self.comments.select_related('author').order_by('-created_at', '-id')[:comment_preview_limit()]
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, related_name='comments', on_delete=models.CASCADE)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Threading (posts.threads): the comment replied to, and the materialized
+    # path of zero-padded ancestor ids ending with this comment's own id
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    path = models.CharField(max_length=255, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Direct replies, kept current by posts.threads
+    reply_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # A post's comments in order, and the per-post comment preview
+            models.Index(fields=['post', 'created_at'], name='posts_comment_post_created_idx'),
+            # Top-level comments (parent NULL) or one comment's replies, in thread order
+            models.Index(fields=['post', 'parent', 'path'], name='posts_comment_thread_idx'),
+            # A whole subtree is one range over this index
+            models.Index(fields=['path'], name='posts_comment_path_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username}"
@@ -31,5 +93,85 @@ class Like(models.Model):
 
     class Meta:
         unique_together = ('post', 'user')
+        indexes = [
+            # "Which of these posts did I like?" and a user's likes (suggestions)
+            models.Index(fields=['user', 'post'], name='posts_like_user_post_idx'),
+        ]
+
+class LikeCountDelta(models.Model):
+    """
+    A like (+1) or unlike (-1) whose counter update waits for counters.flush
+    (POSTS_BUFFER_LIKE_COUNTS). Written in the like's own transaction, so
+    every process, and the maintenance commands, drain the same queue.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    likes = models.SmallIntegerField()
+    # When the like was made; its trending contribution depends on it
+    created_at = models.DateTimeField()
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home-timeline row: one per (recipient, post).
+    Filled on write (fan-out) so the feed is a single indexed range read.
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copy of post.created_at so the timeline can be ordered from its own index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('recipient', 'post')
+        indexes = [
+            # Covers a feed page: (created_at, post) in order for one recipient
+            models.Index(fields=['recipient', '-created_at', '-post'], name='posts_timeline_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of user {self.recipient_id}"
 
-    
\ No newline at end of file
+class Hashtag(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # stored lowercased, without '#'
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+class PostHashtag(models.Model):
+    """A hashtag used in a post; filled by posts.tags when the post is saved."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_hashtags')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_hashtags')
+    # Copy of post.created_at so "posts tagged #x" is a range over one index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('hashtag', 'post')
+        indexes = [
+            # Covers a page of "posts tagged #x": (created_at, post) in order
+            models.Index(fields=['hashtag', '-created_at', '-post'], name='posts_hashtag_recent_idx'),
+        ]
+
+class HashtagBucket(models.Model):
+    """Uses of a hashtag per hour; trending sums the buckets inside the window."""
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='buckets')
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hashtag', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='posts_hashtag_bucket_hour_idx'),
+        ]
+
+class Mention(models.Model):
+    """An @username in a post; the mentioned user is notified once per post."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mentions')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'user')
+        indexes = [
+            # Covers a page of a user's mentions: (created_at, post) in order
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_mention_user_idx'),
+        ]
@@ -0,0 +1,187 @@
+"""
+Full-text search over Post.title / Post.content.
+
+DRF's SearchFilter compiles to `LIKE '%term%'` on both columns, which scans
+the whole table. On SQLite the posts are instead mirrored into an FTS5
+inverted index (table `posts_post_fts`, created by migration 0005). A MATCH
+walks only the posting lists of the query's terms. posts.signals keeps the
+index current on save/delete, and `manage.py rebuild_search_index` rebuilds
+it from scratch.
+
+Backends are pluggable through POSTS_SEARCH_BACKEND, a dotted path to a
+class with index/remove/rebuild/filter/search methods. By default FTS5 is
+used when the table exists and LikeSearchBackend otherwise (e.g. another
+database), so the API behaves the same everywhere, only slower.
+
+Ranking: the best POSTS_SEARCH_CANDIDATES matches by relevance (bm25, title
+weighted above content) are re-scored as relevance * (1 + recency). The
+recency boost halves every POSTS_SEARCH_HALF_LIFE_DAYS, so a fresh post can
+outrank an equally relevant old one by up to 2x.
+"""
+import re
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+TITLE_WEIGHT = 2.0
+CONTENT_WEIGHT = 1.0
+
+
+def candidate_limit():
+    return getattr(settings, 'POSTS_SEARCH_CANDIDATES', 200)
+
+
+def half_life_days():
+    return getattr(settings, 'POSTS_SEARCH_HALF_LIFE_DAYS', 30)
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def rank(matches, now=None):
+    """[(post_id, relevance, created_at), ...] -> post ids, best first."""
+    now = now or timezone.now()
+    scored = []
+    for post_id, relevance, created_at in matches:
+        age_days = max((now - created_at).total_seconds(), 0) / 86400
+        scored.append((relevance * (1 + 0.5 ** (age_days / half_life_days())), post_id))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [post_id for _, post_id in scored]
+
+
+class SQLiteFTSBackend:
+    """FTS5 index with rowid = post id."""
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every term so user input can't inject FTS syntax; the last
+        # term also matches as a prefix for search-as-you-type
+        quoted = ['"%s"' % term for term in terms(query)]
+        if quoted:
+            quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def index(self, posts):
+        rows = [(post.pk, post.title, post.content, post.created_at.timestamp()) for post in posts]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content, created) VALUES (%s, %s, %s, %s)', rows
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in post_ids])
+
+    def rebuild(self, batch_size=1000):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        posts = Post.objects.only('pk', 'title', 'content', 'created_at').order_by('pk')
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) == batch_size:
+                self.index(batch)
+                batch = []
+        self.index(batch)
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        matching = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression])
+        return queryset.filter(pk__in=matching)
+
+    def search(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({FTS_TABLE}, %s, %s), created FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY 2 LIMIT %s',
+                [TITLE_WEIGHT, CONTENT_WEIGHT, expression, limit],
+            )
+            rows = cursor.fetchall()
+        # bm25() is lower-is-better and negative; flip it into a positive relevance
+        return [(pk, -score, datetime.fromtimestamp(created, dt_timezone.utc)) for pk, score, created in rows]
+
+
+class LikeSearchBackend:
+    """Fallback without an index: the old icontains scan, scored by term hits."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        pass
+
+    def filter(self, queryset, query):
+        for term in terms(query):
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        return queryset
+
+    def search(self, query, limit):
+        words = terms(query)
+        if not words:
+            return []
+        posts = self.filter(Post.objects.all(), query).order_by('-created_at').values_list(
+            'pk', 'title', 'content', 'created_at'
+        )[:limit]
+        matches = []
+        for pk, title, content, created_at in posts:
+            title, content = title.lower(), content.lower()
+            hits = sum(TITLE_WEIGHT * title.count(w) + CONTENT_WEIGHT * content.count(w) for w in words)
+            matches.append((pk, hits, created_at))
+        return matches
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _default_backend():
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SQLiteFTSBackend()
+    return LikeSearchBackend()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+                _backend = import_string(path)() if path else _default_backend()
+    return _backend
+
+
+def search(query, limit=None):
+    """Post ids matching `query`, ranked by relevance and recency."""
+    return rank(get_backend().search(query, limit or candidate_limit()))
+
+
+class FullTextSearchFilter(SearchFilter):
+    """`?search=` on list views, answered by the search backend instead of LIKE scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not terms(query):
+            return queryset
+        return get_backend().filter(queryset, query)
@@ -1,20 +1,90 @@
 from rest_framework import serializers
-from .models import Post, Comment
+from .models import Post, Comment, Like
+from . import threads
+
+
+def user_engagement(user, post_ids, liked=None):
+    """
+    (ids of posts `user` liked, ids of posts `user` commented on) among
+    `post_ids`: one query each. `liked` skips the first when the view already
+    read the user's likes of these posts (see PostViewSet).
+    """
+    if user is None or not user.is_authenticated or not post_ids:
+        return set(), set()
+    if liked is None:
+        liked = Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    commented = Comment.objects.filter(author=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    return set(liked), set(commented.distinct())
+
 
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
 
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'author', 'content', 'created_at', 'updated_at')
-        read_only_fields = ('author', 'created_at', 'updated_at')
+        fields = ('id', 'post', 'parent', 'author', 'content', 'depth', 'reply_count', 'created_at', 'updated_at')
+        read_only_fields = ('author', 'depth', 'reply_count', 'created_at', 'updated_at')
+
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        if self.instance is not None:
+            if 'post' in attrs and attrs['post'].pk != self.instance.post_id:
+                raise serializers.ValidationError({'post': 'A comment cannot be moved to another post.'})
+            if 'parent' in attrs and parent != self.instance.parent:
+                raise serializers.ValidationError({'parent': 'A comment cannot be moved to another thread.'})
+            return attrs
+        if parent is not None:
+            view = self.context.get('view')
+            post_id = view.kwargs.get('post_pk') if view else None
+            if post_id is None and attrs.get('post') is not None:
+                post_id = attrs['post'].pk
+            if str(parent.post_id) != str(post_id):
+                raise serializers.ValidationError({'parent': 'Replies must be on the same post.'})
+            if parent.depth >= threads.max_depth():
+                raise serializers.ValidationError({'parent': 'This thread is nested too deeply to reply to.'})
+        return attrs
+
+class PostListSerializer(serializers.ListSerializer):
+    """Looks up the requesting user's likes and comments for the whole page up front."""
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        self.child.engagement = user_engagement(
+            getattr(request, 'user', None), [post.pk for post in posts], self.context.get('liked_post_ids'),
+        )
+        return super().to_representation(posts)
 
 class PostSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
-    comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
+    # Latest POSTS_COMMENT_PREVIEW comments (prefetched by Post.objects.with_related())
+    comments = CommentSerializer(source='comment_preview', many=True, read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
+    commented_by_me = serializers.SerializerMethodField()
+
+    # (liked ids, commented ids); filled per page by PostListSerializer
+    engagement = (set(), set())
 
     class Meta:
         model = Post
-        fields = ('id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments', 'likes_count')
-        read_only_fields = ('author', 'created_at', 'updated_at')
+        list_serializer_class = PostListSerializer
+        fields = (
+            'id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments',
+            'likes_count', 'comments_count', 'liked_by_me', 'commented_by_me',
+        )
+        read_only_fields = ('author', 'created_at', 'updated_at', 'likes_count', 'comments_count')
+
+    def to_representation(self, instance):
+        if not isinstance(self.parent, PostListSerializer):
+            # A single post (detail, create, update)
+            request = self.context.get('request')
+            self.engagement = user_engagement(
+                getattr(request, 'user', None), [instance.pk], self.context.get('liked_post_ids'),
+            )
+        return super().to_representation(instance)
+
+    def get_liked_by_me(self, post):
+        return post.pk in self.engagement[0]
+
+    def get_commented_by_me(self, post):
+        return post.pk in self.engagement[1]
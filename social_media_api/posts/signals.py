@@ -1,24 +1,56 @@
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import Like, Comment
-from notifications.models import Notification
-
-@receiver(post_save, sender=Like)
-def notify_like(sender, instance, created, **kwargs):
-    if created and instance.user != instance.post.author:
-        Notification.objects.create(
-            recipient=instance.post.author,
-            actor=instance.user,
-            verb='liked your post',
-            target=instance.post
-        )
+from .models import Comment, Post, TimelineEntry
+from . import search, tags, threads, timeline
+
+@receiver(m2m_changed, sender=get_user_model().following.through)
+def sync_timeline_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep materialized timelines in step with follow/unfollow."""
+    if action == 'post_add':
+        if reverse:
+            # followee.followers.add(*followers)
+            for follower_id in pk_set:
+                timeline.backfill(follower_id, [instance.pk])
+        else:
+            timeline.backfill(instance.pk, pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            TimelineEntry.objects.filter(recipient_id__in=pk_set, post__author=instance).delete()
+        else:
+            timeline.remove_authors(instance.pk, pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            TimelineEntry.objects.filter(post__author=instance).delete()
+        else:
+            TimelineEntry.objects.filter(recipient=instance).delete()
+
+
+def _text_changed(update_fields):
+    return update_fields is None or bool({'title', 'content'} & set(update_fields))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text index in step with the post's text."""
+    if _text_changed(update_fields):
+        search.get_backend().index([instance])
+
+
+@receiver(post_save, sender=Post)
+def extract_tags(sender, instance, created, update_fields=None, **kwargs):
+    """Hashtag and mention rows (and mention notifications) for the post's text."""
+    if _text_changed(update_fields):
+        tags.sync_post(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
 
 @receiver(post_save, sender=Comment)
-def notify_comment(sender, instance, created, **kwargs):
-    if created and instance.author != instance.post.author:
-        Notification.objects.create(
-            recipient=instance.post.author,
-            actor=instance.author,
-            verb='commented on your post',
-            target=instance.post
-        )
+def thread_comment(sender, instance, created, **kwargs):
+    """Give a new comment its materialized path (it needs the comment's id)."""
+    if created:
+        threads.attach(instance)
@@ -0,0 +1,115 @@
+"""
+Hashtags and @mentions pulled out of post text.
+
+When a post is saved (posts.signals), `sync_post` parses its title and
+content and brings the PostHashtag / Mention rows in line with it, using set
+operations and bulk writes, so a post costs a fixed handful of queries
+however many tags it carries. Lookups ("posts tagged #x", "posts mentioning
+me") are then range scans over (hashtag, created_at) and (user, created_at).
+
+Trending tags are counted incrementally: each new use of a tag bumps that
+tag's HashtagBucket for the current hour, and `trending` sums the buckets in
+the last POSTS_TRENDING_TAG_HOURS hours. It never looks at the posts.
+Removing a tag from a post later does not un-count the use.
+
+Newly mentioned users get one 'mentioned you' notification per post,
+queued in a single batch through notifications.outbox.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from notifications import outbox
+
+from .models import Hashtag, HashtagBucket, Mention, PostHashtag
+
+HASHTAG_RE = re.compile(r'(?<![\w#])#(\w{1,100})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+
+def trending_window_hours():
+    return getattr(settings, 'POSTS_TRENDING_TAG_HOURS', 24)
+
+
+def extract_hashtags(text):
+    return {name.lower() for name in HASHTAG_RE.findall(text)}
+
+
+def extract_mentions(text):
+    # "@bob." at the end of a sentence mentions bob
+    return {name.rstrip('.') for name in MENTION_RE.findall(text)} - {''}
+
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _count_uses(hashtag_ids, moment):
+    """Bump this hour's bucket of every tag: one INSERT for missing buckets, one UPDATE."""
+    hour = _hour(moment)
+    HashtagBucket.objects.bulk_create(
+        [HashtagBucket(hashtag_id=pk, hour=hour) for pk in hashtag_ids], ignore_conflicts=True
+    )
+    HashtagBucket.objects.filter(hashtag_id__in=hashtag_ids, hour=hour).update(count=F('count') + 1)
+
+
+def sync_hashtags(post, created, count_uses=True):
+    names = extract_hashtags(f'{post.title} {post.content}')
+    if created:
+        current = {}
+    else:
+        current = dict(post.post_hashtags.values_list('hashtag__name', 'pk'))
+    added = names - current.keys()
+    removed = [current[name] for name in current.keys() - names]
+    if removed:
+        PostHashtag.objects.filter(pk__in=removed).delete()
+    if added:
+        Hashtag.objects.bulk_create([Hashtag(name=name) for name in added], ignore_conflicts=True)
+        ids = list(Hashtag.objects.filter(name__in=added).values_list('pk', flat=True))
+        PostHashtag.objects.bulk_create(
+            [PostHashtag(post=post, hashtag_id=pk, created_at=post.created_at) for pk in ids], ignore_conflicts=True
+        )
+        if count_uses:
+            _count_uses(ids, timezone.now())
+
+
+def sync_mentions(post, created, notify=True):
+    usernames = extract_mentions(f'{post.title} {post.content}')
+    current = set() if created else set(post.mentions.values_list('user_id', flat=True))
+    if not usernames and not current:
+        return
+    mentioned = set()
+    if usernames:
+        users = get_user_model().objects.filter(username__in=usernames, is_active=True).exclude(pk=post.author_id)
+        mentioned = set(users.values_list('pk', flat=True))
+    if current - mentioned:
+        Mention.objects.filter(post=post, user_id__in=current - mentioned).delete()
+    added = mentioned - current
+    if added:
+        Mention.objects.bulk_create(
+            [Mention(post=post, user_id=pk, created_at=post.created_at) for pk in added], ignore_conflicts=True
+        )
+        if notify:
+            outbox.enqueue_many((pk, post.author_id, 'mentioned you', post) for pk in added)
+
+
+def sync_post(post, created=False):
+    """Bring a post's hashtag and mention rows in line with its current text."""
+    sync_hashtags(post, created)
+    sync_mentions(post, created)
+
+
+def trending(limit=10, hours=None):
+    """[{'tag': name, 'count': uses}, ...] over the last `hours` hours, most used first."""
+    since = _hour(timezone.now() - timedelta(hours=hours or trending_window_hours()))
+    rows = (
+        HashtagBucket.objects.filter(hour__gte=since)
+        .values('hashtag__name')
+        .annotate(uses=Sum('count'))
+        .order_by('-uses', 'hashtag__name')[:limit]
+    )
+    return [{'tag': row['hashtag__name'], 'count': row['uses']} for row in rows]
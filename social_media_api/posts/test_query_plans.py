@@ -0,0 +1,233 @@
+"""
+Query-plan regression tests.
+
+Each test builds the queryset an endpoint runs, executes it, and asks SQLite
+for the plan of every SELECT it issued (prefetches included). Flagged:
+
+- a bare `SCAN <table>`: a full table read;
+- `SCAN <table> USING INDEX`, unless it is the first page of a list: a
+  LIMIT, no filter on the table, and an index that leads with the ORDER BY
+  columns, so the walk stops after the page;
+- `USE TEMP B-TREE FOR ORDER BY` under a LIMIT: the page is cut from a sort
+  of every matching row. Sorting rows fetched by a literal list of primary
+  keys (a page of ids read elsewhere) is bounded by the list and allowed;
+  sorting ties (`RIGHT PART OF ORDER BY`) is too.
+
+Scans of derived tables are fine. The planner works from the schema, not the
+row counts, so a handful of rows gives the same plans as production volumes.
+"""
+import re
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import FollowSuggestion
+from notifications.models import Notification
+from notifications.views import NotificationPagination
+from social_media_api.pagination import KeysetPagination, keyset_window
+
+from . import tags, threads, timeline
+from .models import Comment, Hashtag, Like, Mention, Post, PostHashtag
+from .serializers import user_engagement
+from .views import PostViewSet
+
+User = get_user_model()
+
+SCAN_RE = re.compile(r'^SCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+ORDER_BY_RE = re.compile(r' ORDER BY (.+?)(?: LIMIT |$)')
+ORDER_COLUMN_RE = re.compile(r'"(\w+)"(?: (?:ASC|DESC))?$')
+# Django's aliases for repeated or subquery tables (U0, T3, ...)
+ALIAS_RE = re.compile(r'^[A-Z]\d+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', password='password123')
+        cls.bob = User.objects.create_user(username='bob', password='password123')
+        cls.bob.following.add(cls.alice)
+        cls.post = Post.objects.create(author=cls.alice, title='hello #django', content='hi @bob')
+        tags.sync_post(cls.post, created=True)
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.bob, content='nice')
+        cls.comment.refresh_from_db()
+        Comment.objects.create(post=cls.post, author=cls.alice, content='thanks', parent=cls.comment)
+        Like.objects.create(post=cls.post, user=cls.bob)
+        Notification.objects.create(recipient=cls.alice, actor=cls.bob, verb='liked your post', target=cls.post)
+
+    def capture(self, run):
+        """(sql, params) of every SELECT issued while `run()` executes."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            run()
+        return statements
+
+    def full_scans(self, sql, params):
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+        paginated = ' LIMIT ' in sql
+        scans = []
+        for detail in details:
+            match = SCAN_RE.match(detail)
+            if not match:
+                continue
+            name, index = match.groups()
+            if not (name in tables or ALIAS_RE.match(name)):
+                continue
+            if index and paginated and self.serves_page(sql, details, name, index):
+                continue
+            scans.append(detail)
+        if paginated and 'USE TEMP B-TREE FOR ORDER BY' in details and not self.sorts_key_list(details):
+            scans.append('USE TEMP B-TREE FOR ORDER BY')
+        return scans, details
+
+    def serves_page(self, sql, details, table, index):
+        """An unfiltered walk of an index that yields the ORDER BY directly."""
+        where = sql.split(' WHERE ', 1)[1] if ' WHERE ' in sql else ''
+        order_by = ORDER_BY_RE.search(sql)
+        if 'USE TEMP B-TREE FOR ORDER BY' in details or f'"{table}".' in where or not order_by:
+            return False
+        if table not in connection.introspection.table_names():
+            return False
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_constraints(cursor, table)[index]['columns']
+        ordering = [ORDER_COLUMN_RE.search(term).group(1) for term in order_by.group(1).split(', ')]
+        return columns[:len(ordering)] == ordering
+
+    @staticmethod
+    def sorts_key_list(details):
+        """Rows fetched by a literal list of primary keys, with no subquery feeding it."""
+        return (
+            any(detail.endswith('USING INTEGER PRIMARY KEY (rowid=?)') for detail in details)
+            and not any(detail.startswith(('LIST SUBQUERY', 'CORRELATED', 'SCALAR SUBQUERY')) for detail in details)
+        )
+
+    def assertIndexed(self, queryset_or_callable):
+        run = queryset_or_callable if callable(queryset_or_callable) else lambda: list(queryset_or_callable)
+        statements = self.capture(run)
+        self.assertTrue(statements, 'nothing was queried')
+        for sql, params in statements:
+            scans, details = self.full_scans(sql, params)
+            self.assertFalse(scans, f'full table scan in:\n{sql}\nplan:\n' + '\n'.join(details))
+
+    def page(self, queryset, ordering=KeysetPagination.ordering, size=10):
+        return queryset.order_by(*ordering)[:size + 1]
+
+    def test_post_list(self):
+        self.assertIndexed(self.page(Post.objects.with_related()))
+
+    def test_post_list_seek(self):
+        # Second page of the keyset paginator: (created_at, id) < the cursor row
+        position = [timezone.now(), self.post.pk]
+        self.assertIndexed(keyset_window(Post.objects.with_related(), KeysetPagination.ordering, position)[:11])
+
+    def test_author_posts(self):
+        self.assertIndexed(self.page(Post.objects.filter(author=self.alice)))
+
+    def test_conditional_get_validators(self):
+        view = PostViewSet(request=SimpleNamespace(user=self.bob))
+        self.assertIndexed(lambda: view._validators(self.page(Post.objects.with_related()), many=True))
+
+    def test_post_comments(self):
+        self.assertIndexed(Comment.objects.select_related('author').filter(post=self.post).order_by('created_at'))
+
+    def test_comment_thread_pages(self):
+        comments = Comment.objects.select_related('author').filter(post=self.post)
+        ordering = ('path',)
+        self.assertIndexed(self.page(comments.filter(parent__isnull=True), ordering))
+        self.assertIndexed(self.page(comments.filter(parent=self.comment, path__gt=self.comment.path), ordering))
+        self.assertIndexed(self.page(threads.subtree(self.comment).select_related('author'), ordering))
+
+    def test_comment_preview(self):
+        self.assertIndexed(lambda: [post.comment_preview for post in Post.objects.with_related()[:10]])
+
+    def feed_page(self, position=None):
+        ids = timeline.page_post_ids(self.bob, position, limit=11)
+        return list(self.page(Post.objects.with_related().filter(pk__in=ids)))
+
+    def test_feed(self):
+        timeline.fan_out_post(self.post)
+        self.assertIndexed(self.feed_page)
+        self.assertIndexed(lambda: self.feed_page([timezone.now(), self.post.pk]))
+
+    @override_settings(POSTS_FANOUT_THRESHOLD=1)
+    def test_feed_with_celebrities(self):
+        self.assertIndexed(self.feed_page)
+        self.assertIndexed(lambda: self.feed_page([timezone.now(), self.post.pk]))
+
+    def test_notification_list(self):
+        queryset = Notification.objects.filter(recipient=self.alice).select_related('actor', 'recipient', 'content_type')
+        self.assertIndexed(self.page(queryset, NotificationPagination.ordering))
+
+    def test_notification_unread_count(self):
+        self.assertIndexed(lambda: Notification.objects.filter(recipient=self.alice, unread=True).count())
+
+    def test_notification_mark_read_before(self):
+        before = timezone.now() + timedelta(minutes=1)
+        self.assertIndexed(Notification.objects.filter(recipient=self.alice, unread=True, timestamp__lte=before))
+
+    def test_followers_and_following(self):
+        Follow = User.following.through
+        self.assertIndexed(self.page(Follow.objects.filter(to_user=self.alice).select_related('from_user'), ('-id',)))
+        self.assertIndexed(self.page(Follow.objects.filter(from_user=self.bob).select_related('to_user'), ('-id',)))
+
+    def test_follow_suggestions(self):
+        rows = FollowSuggestion.objects.filter(user=self.bob).order_by('-score', 'suggested_id')
+        self.assertIndexed(rows.values_list('suggested_id', 'score')[:10])
+
+    def test_likes_by_user(self):
+        self.assertIndexed(Like.objects.filter(user=self.bob).values_list('post_id', flat=True))
+        self.assertIndexed(Like.objects.filter(user=self.bob, post_id__in=[self.post.pk]).values_list('post_id', flat=True))
+
+    def test_engagement_flags(self):
+        self.assertIndexed(lambda: user_engagement(self.bob, [self.post.pk, self.post.pk + 1]))
+
+    def linked_page(self, links, position=None):
+        ids = list(keyset_window(links, ('-created_at', '-post_id'), position).values_list('post_id', flat=True)[:11])
+        return list(self.page(Post.objects.with_related().filter(pk__in=ids)))
+
+    def test_tagged_posts(self):
+        links = PostHashtag.objects.filter(hashtag=Hashtag.objects.get(name='django'))
+        self.assertIndexed(lambda: self.linked_page(links))
+        self.assertIndexed(lambda: self.linked_page(links, [timezone.now(), self.post.pk]))
+
+    def test_mentions(self):
+        links = Mention.objects.filter(user=self.bob)
+        self.assertIndexed(lambda: self.linked_page(links))
+        self.assertIndexed(lambda: self.linked_page(links, [timezone.now(), self.post.pk]))
+
+    def test_trending_top(self):
+        self.assertIndexed(Post.objects.filter(hot_score__gt=0).order_by('-hot_score', '-id')[:100])
+
+    def test_detector_flags_unindexed_filter(self):
+        # Guard against the check itself going blind: content has no index
+        sql, params = Post.objects.filter(content='x').order_by().query.sql_with_params()
+        self.assertEqual(self.full_scans(sql, params)[0], ['SCAN posts_post'])
+        # Without a LIMIT, walking the ordering index reads every row as well
+        sql, params = Post.objects.filter(content='x').query.sql_with_params()
+        self.assertTrue(self.full_scans(sql, params)[0])
+        # With one, it still does when a filter the index can't serve discards rows
+        sql, params = Post.objects.filter(content='x')[:10].query.sql_with_params()
+        self.assertTrue(self.full_scans(sql, params)[0])
+
+    def test_detector_flags_sorted_pages(self):
+        # A page cut from a sort of every tagged post
+        tagged = PostHashtag.objects.filter(hashtag__name='django').values('post_id')
+        sql, params = self.page(Post.objects.filter(pk__in=tagged)).query.sql_with_params()
+        self.assertEqual(self.full_scans(sql, params)[0], ['USE TEMP B-TREE FOR ORDER BY'])
+        # Sorting a page of ids that was read elsewhere is bounded
+        sql, params = self.page(Post.objects.filter(pk__in=[self.post.pk, 0])).query.sql_with_params()
+        self.assertEqual(self.full_scans(sql, params)[0], [])
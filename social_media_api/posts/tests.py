@@ -1,3 +1,796 @@
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from notifications.models import NotificationEvent
+
+from . import counters, likes, search, tags, threads, timeline, trending
+from .models import Post, Comment, Hashtag, HashtagBucket, Like, LikeCountDelta, Mention, TimelineEntry
+
+User = get_user_model()
+
+
+class FeedTimelineTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='password123')
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.stranger = User.objects.create_user(username='stranger', password='password123')
+        self.reader.following.add(self.author)
+        self.author.refresh_from_db()  # pick up followers_count, as a fresh request would
+        self.client.force_authenticate(user=self.author)
+
+    def create_post(self, title):
+        response = self.client.post(reverse('posts-list'), {'title': title, 'content': 'body'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def feed_titles(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('post-feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_create_fans_out_to_followers(self):
+        post_id = self.create_post('hello')
+        self.assertTrue(TimelineEntry.objects.filter(recipient=self.reader, post_id=post_id).exists())
+        self.assertFalse(TimelineEntry.objects.filter(recipient=self.stranger).exists())
+        self.assertEqual(self.feed_titles(self.reader), ['hello'])
+        self.assertEqual(self.feed_titles(self.stranger), [])
+
+    @override_settings(POSTS_FANOUT_THRESHOLD=1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        self.create_post('famous')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_titles(self.reader), ['famous'])
+
+    @override_settings(POSTS_FANOUT_THRESHOLD=2)
+    def test_read_fanout_posts_survive_the_author_dropping_below_threshold(self):
+        self.stranger.following.add(self.author)
+        self.create_post('famous')
+        self.assertFalse(Post.objects.get().fanned_out)
+        self.stranger.following.remove(self.author)
+        self.create_post('regular')
+        self.assertEqual(self.feed_titles(self.reader), ['regular', 'famous'])
+
+    @override_settings(POSTS_FANOUT_THRESHOLD=2)
+    def test_fan_out_reads_the_current_follower_count(self):
+        stale_author = User.objects.get(pk=self.author.pk)
+        self.stranger.following.add(self.author)
+        post = Post.objects.create(author=stale_author, title='famous', content='body')
+        self.assertEqual(timeline.fan_out_post(post), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_titles(self.reader), ['famous'])
+
+    @override_settings(POSTS_FANOUT_THRESHOLD=2)
+    def test_pages_merge_timeline_and_celebrity_posts(self):
+        celebrity = User.objects.create_user(username='celebrity')
+        self.reader.following.add(celebrity)
+        self.stranger.following.add(celebrity)
+        for i in range(5):
+            timeline.fan_out_post(Post.objects.create(author=celebrity, title=f'famous {i}', content='body'))
+            self.create_post(f'regular {i}')
+        self.client.force_authenticate(user=self.reader)
+        titles, url, pages = [], reverse('post-feed') + '?page_size=3', []
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data)
+            titles.extend(post['title'] for post in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(titles, [p.title for p in Post.objects.order_by('-created_at', '-id')])
+        back = self.client.get(pages[2]['previous']).data
+        self.assertEqual(back['results'], pages[1]['results'])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        self.create_post('older')
+        self.stranger.following.add(self.author)
+        self.assertEqual(self.feed_titles(self.stranger), ['older'])
+
+        self.stranger.following.remove(self.author)
+        self.assertEqual(self.feed_titles(self.stranger), [])
+        self.assertEqual(Post.objects.count(), 1)
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.fan = User.objects.create_user(username='fan', password='password123')
+        self.post = Post.objects.create(author=self.author, title='Counted', content='body')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_and_unlike_adjust_likes_count(self):
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        self.client.post(reverse('post-unlike', args=[self.post.pk]))
+        self.client.post(reverse('post-unlike', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_comment_create_and_delete_adjust_comments_count(self):
+        url = reverse('post-comments', args=[self.post.pk])
+        response = self.client.post(url, {'post': self.post.pk, 'content': 'nice'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+        detail = reverse('post-comment-detail', args=[self.post.pk, response.data['id']])
+        self.client.delete(detail)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_detail_reports_stored_counters(self):
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        response = self.client.get(reverse('posts-detail', args=[self.post.pk]))
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['comments_count'], 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Comment.objects.create(post=self.post, author=self.fan, content='bypassed the API')
+        Post.objects.filter(pk=self.post.pk).update(likes_count=7)
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (0, 1))
+
+
+class IdempotentLikeTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.fan = User.objects.create_user(username='fan', password='password123')
+        self.post = Post.objects.create(author=self.author, title='Liked', content='body')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_is_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(likes.add(self.fan.pk, self.post.pk))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('INSERT'))
+        self.assertFalse(likes.add(self.fan.pk, self.post.pk))
+        self.assertEqual(Like.objects.count(), 1)
+
+    def test_unlike_returns_created_at_once(self):
+        likes.add(self.fan.pk, self.post.pk)
+        created_at = Like.objects.get().created_at
+        self.assertEqual(likes.remove(self.fan.pk, self.post.pk), created_at)
+        self.assertIsNone(likes.remove(self.fan.pk, self.post.pk))
+
+    def test_missing_post_is_404(self):
+        for action in ('post-like', 'post-unlike'):
+            response = self.client.post(reverse(action, args=[self.post.pk + 100]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+    def test_like_notifies_author(self):
+        response = self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event = NotificationEvent.objects.get()
+        self.assertEqual((event.recipient_id, event.actor_id, event.object_id), (self.author.pk, self.fan.pk, self.post.pk))
+
+
+class ConcurrentLikeTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password123') for i in range(4)]
+        self.post = Post.objects.create(author=self.author, title='Contended', content='body')
+
+    def request(self, client, action):
+        # The test database is in-memory SQLite in shared-cache mode, where a
+        # colliding writer fails with "table is locked" at once instead of
+        # waiting; retry like a client would (the view's transaction rolled back)
+        for attempt in range(200):
+            try:
+                return client.post(reverse(action, args=[self.post.pk])).status_code
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                time.sleep(0.005)
+        raise AssertionError('database stayed locked')
+
+    def hammer(self, fan, rounds=10):
+        client = APIClient()
+        client.force_authenticate(user=fan)
+        codes = []
+        try:
+            for i in range(rounds):
+                # Doubled requests, as from a double tap or a client retry
+                action = 'post-unlike' if i % 2 else 'post-like'
+                codes += [self.request(client, action), self.request(client, action)]
+            codes.append(self.request(client, 'post-like'))
+        finally:
+            connection.close()
+        return codes
+
+    def test_parallel_like_unlike_keeps_counts_exact(self):
+        with ThreadPoolExecutor(max_workers=len(self.fans)) as pool:
+            codes = [code for result in pool.map(self.hammer, self.fans) for code in result]
+        self.assertLessEqual(set(codes), {200, 201}, codes)
+        self.post.refresh_from_db()
+        self.assertEqual(Like.objects.filter(post=self.post).count(), len(self.fans))
+        self.assertEqual(self.post.likes_count, len(self.fans))
+
+
+@override_settings(POSTS_BUFFER_LIKE_COUNTS=True, POSTS_LIKE_FLUSH_SECONDS=3600)
+class BufferedLikeCountTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password123') for i in range(3)]
+        self.post = Post.objects.create(author=self.author, title='Viral', content='body')
+        self.other = Post.objects.create(author=self.author, title='Also liked', content='body')
+
+    def tearDown(self):
+        counters.flush_timer.cancel()
+
+    def like(self, user, post, action='post-like'):
+        self.client.force_authenticate(user=user)
+        # Deltas are buffered when the like's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(action, args=[post.pk]))
+
+    def test_likes_are_recorded_but_counts_wait_for_flush(self):
+        for fan in self.fans:
+            self.like(fan, self.post)
+        self.like(self.fans[0], self.other)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.hot_score), (0, 0))
+
+        # Read the queue, one UPDATE for both posts, delete what was applied; in a savepoint
+        with self.assertNumQueries(5):
+            self.assertEqual(counters.flush(), 2)
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.other.likes_count), (3, 1))
+        self.assertGreater(self.post.hot_score, self.other.hot_score)
+        self.assertFalse(LikeCountDelta.objects.exists())
+        self.assertEqual(counters.flush(), 0)
+
+    def test_own_like_changes_the_etag_before_the_flush(self):
+        self.client.force_authenticate(user=self.fans[0])
+        url = reverse('posts-detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.like(self.fans[0], self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['liked_by_me'], response.data['likes_count']), (True, 0))
+        # Someone else's like waits for the flush, like the count
+        self.client.force_authenticate(user=self.fans[1])
+        etag = self.client.get(url)['ETag']
+        self.like(self.fans[2], self.post)
+        self.client.force_authenticate(user=self.fans[1])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_like_then_unlike_cancels_out(self):
+        self.like(self.fans[0], self.post)
+        self.like(self.fans[0], self.post, action='post-unlike')
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.hot_score), (0, 0))
+
+    def test_flush_matches_unbuffered_scores(self):
+        for fan in self.fans:
+            self.like(fan, self.post)
+        counters.flush()
+        buffered = Post.objects.get(pk=self.post.pk).hot_score
+        trending.recompute()
+        self.assertAlmostEqual(Post.objects.get(pk=self.post.pk).hot_score, buffered, places=6)
+
+    def test_reconcile_leaves_queued_deltas_to_the_flush(self):
+        # Queued in another process: the command sees the same rows
+        self.like(self.fans[0], self.post)
+        self.like(self.fans[1], self.post)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)  # real drift
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (0, 0))
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_negative_net_delta_is_clamped(self):
+        # An unlike whose like was counted by someone else's flush, against a drifted count of 0
+        like = Like.objects.create(post=self.post, user=self.fans[0])
+        self.like(self.fans[0], self.post, action='post-unlike')
+        self.assertEqual(counters.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(Like.objects.filter(pk=like.pk).exists())
+
+
+@override_settings(POSTS_COMMENT_PREVIEW=2)
+class PostQueryCountTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+
+    def create_posts(self, count):
+        Post.objects.all().delete()
+        for i in range(count):
+            author, _ = User.objects.get_or_create(username=f'author{i}')
+            post = Post.objects.create(author=author, title=f'post {i}', content='body')
+            for j in range(3):
+                commenter, _ = User.objects.get_or_create(username=f'commenter{j}')
+                Comment.objects.create(post=post, author=commenter, content='hi')
+            # (re)following backfills the post into the reader's timeline
+            self.reader.following.remove(author)
+            self.reader.following.add(author)
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        for count in (2, 10):
+            with self.subTest(posts=count):
+                self.create_posts(count)
+                # ETag validators (2), posts joined with authors, then capped
+                # comments with authors (no COUNT)
+                with self.assertNumQueries(4):
+                    response = self.client.get(reverse('posts-list'))
+                self.assertEqual(len(response.data['results']), count)
+                self.assertTrue(all(len(post['comments']) == 2 for post in response.data['results']))
+
+    def test_feed_query_count_is_independent_of_page_size(self):
+        self.client.force_authenticate(user=self.reader)
+        counts = []
+        for count in (2, 10):
+            self.create_posts(count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('post-feed'))
+            self.assertEqual(len(response.data['results']), count)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class CommentThreadTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.post = Post.objects.create(author=self.author, title='Threaded', content='body')
+        self.client.force_authenticate(user=self.fan)
+        self.url = reverse('post-comments', args=[self.post.pk])
+
+    def comment(self, content, parent=None):
+        payload = {'post': self.post.pk, 'content': content}
+        if parent:
+            payload['parent'] = parent
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def build_thread(self):
+        a = self.comment('a')
+        b = self.comment('b')
+        a1 = self.comment('a1', parent=a)
+        a1x = self.comment('a1x', parent=a1)
+        a2 = self.comment('a2', parent=a)
+        return a, b, a1, a1x, a2
+
+    def contents(self, response):
+        return [comment['content'] for comment in response.data['results']]
+
+    def test_paths_depths_and_reply_counts(self):
+        a, b, a1, a1x, a2 = self.build_thread()
+        reply = Comment.objects.get(pk=a1x)
+        self.assertEqual(reply.path, threads.segment(a) + threads.segment(a1) + threads.segment(a1x))
+        self.assertEqual(reply.depth, 2)
+        self.assertEqual(Comment.objects.get(pk=a).reply_count, 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        # The parent's author hears about replies from others
+        self.assertFalse(NotificationEvent.objects.filter(verb='replied to your comment').exists())
+        self.client.force_authenticate(user=self.author)
+        self.comment('a3', parent=a)
+        event = NotificationEvent.objects.get(verb='replied to your comment')
+        self.assertEqual((event.recipient_id, event.object_id), (self.fan.pk, a))
+
+    def test_list_shows_top_level_or_one_comments_replies(self):
+        a, *_ = self.build_thread()
+        self.assertEqual(self.contents(self.client.get(self.url)), ['a', 'b'])
+        self.assertEqual(self.contents(self.client.get(self.url, {'parent': a})), ['a1', 'a2'])
+        self.assertEqual(self.client.get(self.url, {'parent': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_load_more_replies_with_cursor(self):
+        a, *_ = self.build_thread()
+        first = self.client.get(self.url, {'parent': a, 'page_size': 1})
+        self.assertEqual(self.contents(first), ['a1'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.contents(second), ['a2'])
+        self.assertIsNone(second.data['next'])
+
+    def test_thread_is_one_range_in_display_order(self):
+        a, *_ = self.build_thread()
+        url = reverse('post-comment-thread', args=[self.post.pk, a])
+        # Comment.objects.get for the root, then the subtree page
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(self.contents(response), ['a1', 'a1x', 'a2'])
+        self.assertEqual(self.contents(self.client.get(url, {'depth': 1})), ['a1', 'a2'])
+
+    def test_reply_must_stay_on_post_and_within_depth(self):
+        other = Post.objects.create(author=self.author, title='Other', content='body')
+        elsewhere = Comment.objects.create(post=other, author=self.fan, content='elsewhere')
+        response = self.client.post(self.url, {'post': self.post.pk, 'content': 'x', 'parent': elsewhere.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(POSTS_COMMENT_MAX_DEPTH=1):
+            a = self.comment('a')
+            a1 = self.comment('a1', parent=a)
+            response = self.client.post(self.url, {'post': self.post.pk, 'content': 'x', 'parent': a1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_comment_cannot_move_to_another_post(self):
+        a, b, a1, a1x, a2 = self.build_thread()
+        other = Post.objects.create(author=self.author, title='Other', content='body')
+        url = reverse('post-comment-detail', args=[self.post.pk, a])
+        response = self.client.patch(url, {'post': other.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Comment.objects.get(pk=a).post_id, self.post.pk)
+        # Naming the post it is already on is fine
+        response = self.client.patch(url, {'post': self.post.pk, 'content': 'edited'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_removes_subtree_from_counters(self):
+        a, b, a1, a1x, a2 = self.build_thread()
+        self.client.delete(reverse('post-comment-detail', args=[self.post.pk, a1]))
+        self.assertEqual(set(Comment.objects.values_list('pk', flat=True)), {a, b, a2})
+        self.assertEqual(Comment.objects.get(pk=a).reply_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        # Three comments left, worth COMMENT_WEIGHT each
+        self.assertAlmostEqual(trending.decayed(self.post.hot_score), 3 * trending.COMMENT_WEIGHT, places=3)
+
+
+class EngagementFlagTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.liked = Post.objects.create(author=self.author, title='liked', content='body')
+        self.commented = Post.objects.create(author=self.author, title='commented', content='body')
+        self.untouched = Post.objects.create(author=self.author, title='untouched', content='body')
+        Like.objects.create(post=self.liked, user=self.reader)
+        Comment.objects.create(post=self.commented, author=self.reader, content='first')
+        Comment.objects.create(post=self.commented, author=self.reader, content='second')
+        self.client.force_authenticate(user=self.reader)
+
+    def flags(self, response_posts):
+        return {post['title']: (post['liked_by_me'], post['commented_by_me']) for post in response_posts}
+
+    def test_list_flags_come_from_one_query_each(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts-list'))
+        self.assertEqual(self.flags(response.data['results']), {
+            'liked': (True, False), 'commented': (False, True), 'untouched': (False, False),
+        })
+        self.assertEqual(sum('"posts_like"' in query['sql'] for query in queries), 1)
+
+        Post.objects.bulk_create([Post(author=self.author, title=f'more {i}', content='body') for i in range(5)])
+        with CaptureQueriesContext(connection) as more:
+            self.client.get(reverse('posts-list'))
+        self.assertEqual(len(more), len(queries))
+
+    def test_detail_flags(self):
+        response = self.client.get(reverse('posts-detail', args=[self.liked.pk]))
+        self.assertEqual((response.data['liked_by_me'], response.data['commented_by_me']), (True, False))
+
+    def test_anonymous_flags_are_false_without_queries(self):
+        self.client.force_authenticate(user=None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts-list'))
+        self.assertEqual(set(self.flags(response.data['results']).values()), {(False, False)})
+        self.assertFalse(any('"posts_like"' in query['sql'] for query in queries))
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.posts = [
+            Post.objects.create(author=self.author, title=f'post {i}', content='body')
+            for i in range(5)
+        ]
+        # Identical timestamps force the id tie-breaker to do its job
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[1:4]]).update(created_at=self.posts[1].created_at)
+
+    def walk(self, url):
+        titles, previous = [], None
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles.extend(post['title'] for post in response.data['results'])
+            url, previous = response.data['next'], response.data['previous']
+        return titles, previous
+
+    def test_walks_every_post_once_newest_first(self):
+        titles, previous = self.walk(reverse('posts-list') + '?page_size=2')
+        expected = [p.title for p in Post.objects.order_by('-created_at', '-id')]
+        self.assertEqual(titles, expected)
+        self.assertIsNotNone(previous)
+
+    def test_previous_link_returns_the_prior_page(self):
+        first = self.client.get(reverse('posts-list') + '?page_size=2').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+    def test_ordering_filter_field_is_respected(self):
+        titles, _ = self.walk(reverse('posts-list') + '?page_size=2&ordering=updated_at')
+        self.assertEqual(titles, [p.title for p in Post.objects.order_by('updated_at', 'id')])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('posts-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.old = Post.objects.create(author=self.author, title='Django tips', content='signals and caching')
+        self.new = Post.objects.create(author=self.author, title='Weekend', content='some django hacking')
+        self.other = Post.objects.create(author=self.author, title='Cooking', content='pasta')
+        Post.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=365))
+
+    def titles(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_uses_full_text_index(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSBackend)
+
+    def test_ranks_by_relevance_and_recency(self):
+        response = self.client.get(reverse('posts-search'), {'q': 'django'})
+        # the title hit outweighs a year of recency
+        self.assertEqual(self.titles(response), ['Django tips', 'Weekend'])
+        response = self.client.get(reverse('posts-search'), {'q': 'djan'})  # prefix match
+        self.assertEqual(len(self.titles(response)), 2)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.new.content = 'nothing to see'
+        self.new.save()
+        self.other.delete()
+        self.assertEqual(search.search('django'), [self.old.pk])
+        self.assertEqual(search.search('pasta'), [])
+
+    def test_list_search_param_and_query_syntax(self):
+        response = self.client.get(reverse('posts-list'), {'search': 'pasta'})
+        self.assertEqual(self.titles(response), ['Cooking'])
+        # FTS operators in user input are treated as plain words
+        response = self.client.get(reverse('posts-search'), {'q': 'django" OR NEAR(*'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('posts-search'), {'q': '  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(sorted(search.search('django')), sorted([self.old.pk, self.new.pk]))
+
+
+class HashtagMentionTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.bob = User.objects.create_user(username='bob')
+        self.client.force_authenticate(user=self.author)
+
+    def create(self, content):
+        response = self.client.post(reverse('posts-list'), {'title': 'Post', 'content': content})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data['id'])
+
+    def test_extraction(self):
+        self.assertEqual(tags.extract_hashtags('#Django and #django, #rest_api but not a#b'), {'django', 'rest_api'})
+        self.assertEqual(tags.extract_mentions('hi @bob. and @carol@x.org, not me@host'), {'bob', 'carol@x.org'})
+
+    def test_tagged_posts_and_edits(self):
+        first = self.create('Learning #Django')
+        second = self.create('More #django and #python')
+        response = self.client.get(reverse('posts-tagged', args=['DJANGO']))
+        self.assertEqual([p['id'] for p in response.data['results']], [second.pk, first.pk])
+        page = self.client.get(reverse('posts-tagged', args=['django']) + '?page_size=1').data
+        self.assertEqual([p['id'] for p in page['results']], [second.pk])
+        page = self.client.get(page['next']).data
+        self.assertEqual(([p['id'] for p in page['results']], page['next']), ([first.pk], None))
+        self.assertEqual(self.client.get(reverse('posts-tagged', args=['nope'])).data['results'], [])
+
+        second.content = 'Only #python now'
+        second.save()
+        response = self.client.get(reverse('posts-tagged', args=['django']))
+        self.assertEqual([p['id'] for p in response.data['results']], [first.pk])
+
+    def test_trending_counts_uses_in_the_window(self):
+        self.create('#python #django')
+        self.create('#python')
+        HashtagBucket.objects.create(
+            hashtag=Hashtag.objects.create(name='stale'), hour=timezone.now() - timedelta(days=3), count=50
+        )
+        response = self.client.get(reverse('posts-trending-tags'))
+        self.assertEqual(response.data, [{'tag': 'python', 'count': 2}, {'tag': 'django', 'count': 1}])
+
+    def test_mentions_notify_once(self):
+        post = self.create('hey @bob and @nobody, also @author')
+        post.content = 'hey @bob again'
+        post.save()
+        self.assertEqual(list(Mention.objects.values_list('post', 'user')), [(post.pk, self.bob.pk)])
+        self.assertEqual(NotificationEvent.objects.filter(recipient=self.bob, verb='mentioned you').count(), 1)
+
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.get(reverse('posts-mentions'))
+        self.assertEqual([p['id'] for p in response.data['results']], [post.pk])
+
+
+class TrendingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.old = Post.objects.create(author=self.author, title='old', content='body')
+        self.new = Post.objects.create(author=self.author, title='new', content='body')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_recent_engagement_outranks_older_engagement(self):
+        three_days_ago = timezone.now() - timedelta(days=3)
+        for user in (self.author, self.fan, User.objects.create_user(username='x')):
+            like = Like.objects.create(post=self.old, user=user)
+            Like.objects.filter(pk=like.pk).update(created_at=three_days_ago)
+        counters.adjust_counts(self.old.pk, likes=3, at=three_days_ago)  # 3 likes worth 1/8 each today
+        self.client.post(reverse('post-like', args=[self.new.pk]))
+
+        response = self.client.get(reverse('posts-trending'))
+        self.assertEqual([p['title'] for p in response.data], ['new', 'old'])
+        self.old.refresh_from_db()
+        self.assertAlmostEqual(trending.decayed(self.old.hot_score), 3 / 8, places=3)
+
+        # Recomputing from the Like rows agrees with the incremental scores
+        before = dict(Post.objects.values_list('pk', 'hot_score'))
+        trending.recompute()
+        for pk, score in Post.objects.values_list('pk', 'hot_score'):
+            self.assertAlmostEqual(score, before[pk], places=6)
+
+    def test_unlike_and_comment_delete_take_their_score_back(self):
+        self.client.post(reverse('post-like', args=[self.new.pk]))
+        self.client.post(reverse('post-unlike', args=[self.new.pk]))
+        url = reverse('post-comments', args=[self.new.pk])
+        comment = self.client.post(url, {'post': self.new.pk, 'content': 'hi'}, format='json').data
+        self.client.delete(reverse('post-comment-detail', args=[self.new.pk, comment['id']]))
+        self.new.refresh_from_db()
+        self.assertEqual(self.new.hot_score, 0)
+
+    def test_scores_stay_finite_far_past_the_epoch(self):
+        # 1024 half-lives is where 2 ** half-lives leaves the float range
+        for years in (3, 50):
+            at = trending.epoch() + timedelta(days=365 * years)
+            with self.subTest(years=years):
+                Post.objects.update(hot_score=0)
+                counters.adjust_counts(self.old.pk, likes=1, at=at - timedelta(days=1))
+                counters.adjust_counts(self.new.pk, likes=1, at=at)
+                counters.adjust_counts(self.new.pk, comments=1, at=at)
+                counters.adjust_counts(self.new.pk, comments=-1, at=at)
+                old, new = [Post.objects.get(pk=post.pk).hot_score for post in (self.old, self.new)]
+                self.assertGreater(new, old)
+                self.assertAlmostEqual(trending.decayed(old, now=at), 0.5, places=6)
+                self.assertAlmostEqual(trending.decayed(new, now=at), 1.0, places=6)
+
+    def test_top_ids_are_cached(self):
+        self.client.post(reverse('post-like', args=[self.new.pk]))
+        self.client.get(reverse('posts-trending'))
+        # posts + comment previews + the user's likes/comments, no ranking query
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('posts-trending'))
+        self.assertEqual([p['title'] for p in response.data], ['new'])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.post = Post.objects.create(author=self.author, title='Cached', content='body')
+        self.comment = Comment.objects.create(post=self.post, author=self.fan, content='first')
+        # Anonymous reads are answered by the response cache; exercise the validators directly
+        self.client.force_authenticate(user=self.fan)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_revalidates_without_serializing(self):
+        url = reverse('posts-list')
+        first = self.client.get(url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(3):  # page keys and counters, latest comment edit, the reader's likes
+            response = self.revalidate(url, first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        # Counter changes don't touch updated_at but must still change the ETag
+        counters.adjust_counts(self.post.pk, likes=1)
+        self.assertEqual(self.revalidate(url, first['ETag']).status_code, status.HTTP_200_OK)
+        # So does a different variant of the same resource
+        self.assertNotEqual(self.client.get(url + '?search=cached')['ETag'], first['ETag'])
+
+    def test_list_validates_only_the_requested_page(self):
+        older = Post.objects.create(author=self.author, title='Older', content='body')
+        Post.objects.filter(pk=older.pk).update(created_at=self.post.created_at - timedelta(days=1))
+        url = reverse('posts-list') + '?page_size=1'
+        etag = self.client.get(url)['ETag']
+        # Off the page (and past the has-more probe row): same ETag
+        third = Post.objects.create(author=self.author, title='Oldest', content='body')
+        Post.objects.filter(pk=third.pk).update(created_at=self.post.created_at - timedelta(days=2))
+        counters.adjust_counts(third.pk, likes=1)
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        # On it: a new ETag
+        counters.adjust_counts(self.post.pk, likes=1)
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+
+    def test_retrieve_tracks_embedded_comments(self):
+        url = reverse('posts-detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Comment.objects.filter(pk=self.comment.pk).update(
+            content='edited', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['comments'][0]['content'], 'edited')
+
+    def test_if_modified_since_and_missing_objects(self):
+        url = reverse('posts-detail', args=[self.post.pk])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        missing = self.client.get(reverse('posts-detail', args=[9999]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_pk_is_not_found(self):
+        response = self.client.get(reverse('posts-detail', args=['abc']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_list(self):
+        url = reverse('post-comments', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        Comment.objects.create(post=self.post, author=self.author, content='second')
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, title='Cached', content='body')
+
+    def test_anonymous_hits_skip_the_database(self):
+        url = reverse('posts-detail', args=[self.post.pk])
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            hit = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((hit['X-Cache'], hit.data), ('HIT', first.data))
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Query parameters are part of the key
+        self.assertEqual(self.client.get(reverse('posts-list') + '?page_size=1')['X-Cache'], 'MISS')
+
+    def test_writes_to_dependencies_invalidate(self):
+        url = reverse('posts-list')
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.author, content='new comment')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['comments'][0]['content'], 'new comment')
+
+        counters.adjust_counts(self.post.pk, likes=1)  # UPDATE without signals
+        self.assertEqual(self.client.get(url).data['results'][0]['likes_count'], 1)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.client.force_authenticate(user=self.author)
+        self.client.get(reverse('posts-list'))
+        self.assertNotIn('X-Cache', self.client.get(reverse('posts-list')))
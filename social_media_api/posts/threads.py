@@ -0,0 +1,54 @@
+"""
+Threaded comments stored as a materialized path.
+
+A comment's `path` is the ids of its ancestors followed by its own, each
+zero-padded to PATH_DIGITS: reply 42 to comment 7 has path
+'0000000007' + '0000000042'. Ordering by path is therefore display order
+(depth first, siblings oldest first). A comment's whole subtree is the range
+[path, path + ':'), since ':' sorts right after '9', so reading a subtree is
+one range scan of the path index. Top-level comments, and the direct
+replies of one comment, are ranges of the (post, parent, path) index, which
+KeysetPagination walks with a path cursor ("load more replies").
+
+The path contains the comment's own id, so posts.signals fills it in right
+after the INSERT. The same step bumps the parent's reply_count. Deleting a
+comment deletes its replies (CASCADE), and the API takes the whole subtree
+back from the counters (see CommentViewSet.perform_destroy).
+"""
+from django.conf import settings
+from django.db.models import F
+
+from .models import Comment
+
+PATH_DIGITS = 10
+
+
+def max_depth():
+    # Comment.path (255 chars) has room for 25 levels of PATH_DIGITS
+    return min(getattr(settings, 'POSTS_COMMENT_MAX_DEPTH', 10), 255 // PATH_DIGITS - 1)
+
+
+def segment(pk):
+    return f'{pk:0{PATH_DIGITS}d}'
+
+
+def attach(comment):
+    """Fill in a new comment's path and depth and count it as a reply of its parent."""
+    parent = comment.parent if comment.parent_id else None
+    comment.depth = parent.depth + 1 if parent else 0
+    comment.path = (parent.path if parent else '') + segment(comment.pk)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path, depth=comment.depth)
+    if parent:
+        Comment.objects.filter(pk=parent.pk).update(reply_count=F('reply_count') + 1)
+
+
+def detach(comment):
+    """Stop counting a deleted comment as a reply of its parent."""
+    if comment.parent_id:
+        Comment.objects.filter(pk=comment.parent_id).update(reply_count=F('reply_count') - 1)
+
+
+def subtree(comment, include_self=False):
+    """The replies under `comment` at any depth (and itself), as one path range."""
+    lower = 'path__gte' if include_self else 'path__gt'
+    return Comment.objects.filter(**{lower: comment.path}, path__lt=comment.path + ':')
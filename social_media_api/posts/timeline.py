@@ -0,0 +1,103 @@
+"""
+Home timeline storage (hybrid fan-out).
+
+Posts by regular authors are pushed into each follower's TimelineEntry rows
+when they are written (fan-out-on-write), so reading the feed is one indexed
+range over (recipient, created_at). Authors with at least
+POSTS_FANOUT_THRESHOLD followers are "celebrities": their posts are not copied
+to every follower but pulled in when the feed is read (fan-out-on-read).
+
+The mode is recorded on each post (Post.fanned_out) when it is written, so
+an author crossing the threshold in either direction never strands a post:
+what was fanned out stays in timelines, and what wasn't is still read on
+demand from whoever wrote it.
+
+A feed page is read off TimelineEntry's (recipient, created_at, post)
+index, merged with the same window of each followed author's on-read
+posts, and only then are the posts loaded.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+
+from social_media_api.pagination import keyset_window
+
+from .models import Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def fanout_threshold():
+    return getattr(settings, 'POSTS_FANOUT_THRESHOLD', 1000)
+
+
+def backfill_size():
+    return getattr(settings, 'POSTS_TIMELINE_BACKFILL', 50)
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Push a freshly written post into its author's followers' timelines."""
+    # Not post.author.followers_count: the author instance may be an older copy
+    followers_count = get_user_model().objects.filter(pk=post.author_id).values_list('followers_count', flat=True).get()
+    if followers_count >= fanout_threshold():
+        # Celebrity author: readers pick this post up in page_post_ids()
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        post.fanned_out = False
+        return 0
+    follower_ids = list(post.author.followers.values_list('pk', flat=True))
+    _bulk_insert([
+        TimelineEntry(recipient_id=follower_id, post=post, created_at=post.created_at)
+        for follower_id in follower_ids
+    ])
+    return len(follower_ids)
+
+
+def read_fanout_author_ids(user):
+    """Ids of the users `user` follows who have posts that were not fanned out."""
+    on_read = Post.objects.filter(author=OuterRef('pk'), fanned_out=False)
+    return list(user.following.filter(Exists(on_read)).values_list('pk', flat=True))
+
+
+def page_post_ids(user, position=None, reverse=False, limit=20):
+    """
+    Ids of the next `limit` posts of `user`'s home feed after `position`
+    ((created_at, post id) of the boundary post), newest first, or oldest
+    first when paging backwards.
+    """
+    entries = TimelineEntry.objects.filter(recipient=user)
+    rows = list(keyset_window(entries, ('-created_at', '-post_id'), position, reverse).values_list('created_at', 'post_id')[:limit])
+    for author_id in read_fanout_author_ids(user):
+        # One bounded range per author; an IN over all of them would sort every post they wrote
+        posts = Post.objects.filter(author_id=author_id, fanned_out=False)
+        rows += keyset_window(posts, ('-created_at', '-id'), position, reverse).values_list('created_at', 'pk')[:limit]
+    return [post_id for _, post_id in sorted(rows, reverse=not reverse)[:limit]]
+
+
+def backfill(follower_id, author_ids):
+    """Copy the latest fanned-out posts of newly followed authors into a timeline."""
+    latest = (
+        Post.objects.filter(author_id__in=author_ids, fanned_out=True)
+        .annotate(rank=Window(RowNumber(), partition_by=F('author_id'), order_by=F('created_at').desc()))
+        .filter(rank__lte=backfill_size())
+        .values_list('pk', 'created_at')
+    )
+    _bulk_insert([
+        TimelineEntry(recipient_id=follower_id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in latest
+    ])
+
+
+def remove_authors(follower_id, author_ids):
+    """Drop an unfollowed author's posts from a follower's timeline."""
+    TimelineEntry.objects.filter(recipient_id=follower_id, post__author_id__in=author_ids).delete()
+
+
+def rebuild(user):
+    """Rebuild one user's timeline from scratch (used by the management command)."""
+    TimelineEntry.objects.filter(recipient=user).delete()
+    backfill(user.pk, list(user.following.values_list('pk', flat=True)))
@@ -0,0 +1,155 @@
+"""
+Trending posts: likes and comments with exponential time decay.
+
+Each like/comment is worth `weight * 2 ** (-age / half_life)`. Decaying every
+post's score as time passes would mean rewriting all of them, so this uses
+forward decay: an event at time t is worth `weight * 2 ** ((t - epoch) /
+half_life)`, the newest events the most. Dividing every post's sum by the
+same 2 ** ((now - epoch) / half_life) gives the decayed values, so ordering by
+the sum is already the decayed ranking, and the `-hot_score` index makes the
+top N a short index read. Scores only change when counters.adjust_counts
+(or a flush of buffered likes) runs.
+
+Those sums pass the float range after ~1000 half-lives, so Post.hot_score
+holds them in log space: log2(1 + sum). Adding or taking back an event is a
+log-sum-exp done by the UPDATE itself (`updated_score`), in which 2 is only
+ever raised to a power <= 0, so nothing overflows however far from
+POSTS_TRENDING_EPOCH the clock gets. The 1 keeps an empty score at 0.
+Run `manage.py recompute_trending_scores` after changing the half-life,
+epoch or weights.
+
+The top POSTS_TRENDING_SIZE ids are cached and re-read every
+POSTS_TRENDING_REFRESH_SECONDS, so the endpoint usually costs no ranking
+query at all.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from .models import Comment, Like, Post
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+CACHE_KEY = 'posts:trending:top'
+# Log-space value of "no events": 2 ** NOTHING is 0.0 next to any real score
+NOTHING = -1e9
+# 2 ** -1000 is already 0 next to 1.0; lower powers underflow, which
+# PostgreSQL reports as an error rather than rounding to 0
+MIN_EXPONENT = -1000.0
+# Taking back events that leave less than 2 ** -30 of a score left is taken
+# to empty it: the rest is rounding error of the floats
+CANCELLED = -math.log2(1 - 2 ** -30)
+
+
+def epoch():
+    return getattr(settings, 'POSTS_TRENDING_EPOCH', datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+
+
+def half_life_hours():
+    return getattr(settings, 'POSTS_TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def top_size():
+    return getattr(settings, 'POSTS_TRENDING_SIZE', 100)
+
+
+def refresh_seconds():
+    return getattr(settings, 'POSTS_TRENDING_REFRESH_SECONDS', 60)
+
+
+def half_lives(at):
+    """Half-lives from the epoch to `at`: log2 of its forward-decay factor."""
+    return (at - epoch()).total_seconds() / 3600 / half_life_hours()
+
+
+def event(likes=0, comments=0, at=None):
+    """A (weight, at) engagement event; a negative weight takes one back."""
+    return likes * LIKE_WEIGHT + comments * COMMENT_WEIGHT, at or timezone.now()
+
+
+def log_sum(values):
+    """log2(sum(2 ** v for v in values)), without leaving log space."""
+    top = max(values)
+    return top + math.log2(sum(2 ** (value - top) for value in values))
+
+
+def score_change(events):
+    """
+    (added, removed): the log2 forward-decayed sums of what `events` add and
+    take back, NOTHING for either side without events.
+    """
+    added = [math.log2(weight) + half_lives(at) for weight, at in events if weight > 0]
+    removed = [math.log2(-weight) + half_lives(at) for weight, at in events if weight < 0]
+    return (log_sum(added) if added else NOTHING), (log_sum(removed) if removed else NOTHING)
+
+
+def _power_of_two(exponent):
+    return Power(Value(2.0), Greatest(exponent, Value(MIN_EXPONENT)))
+
+
+def updated_score(score, added=NOTHING, removed=NOTHING):
+    """
+    SQL for log2(2 ** score + 2 ** added - 2 ** removed), the new hot_score.
+    `added`/`removed` are floats or expressions; NOTHING leaves a side out.
+    """
+    score, added, removed = [
+        value if hasattr(value, 'resolve_expression') else Value(float(value))
+        for value in (score, added, removed)
+    ]
+    if not (isinstance(added, Value) and added.value == NOTHING):
+        # max + log2(1 + 2 ** -|difference|)
+        score = Greatest(score, added) + Log(Value(2.0), Value(1.0) + _power_of_two(-Abs(score - added)))
+    if not (isinstance(removed, Value) and removed.value == NOTHING):
+        # score + log2(1 - 2 ** (removed - score)), or empty if that cancels it out
+        remaining = score + Log(Value(2.0), Value(1.0) - _power_of_two(removed - score))
+        score = Case(
+            When(LessThanOrEqual(score, removed + Value(CANCELLED)), then=Value(0.0)),
+            default=Greatest(remaining, Value(0.0)),
+            output_field=FloatField(),
+        )
+    return score
+
+
+def decayed(hot_score, now=None):
+    """hot_score as weighted engagement decayed to `now` (for display)."""
+    elapsed = half_lives(now or timezone.now())
+    return 2 ** (hot_score - elapsed) - 2 ** -elapsed
+
+
+def top_post_ids():
+    """Ids of the hottest posts, best first, from the cache when fresh."""
+    ids = cache.get(CACHE_KEY)
+    if ids is None:
+        hottest = Post.objects.filter(hot_score__gt=0).order_by('-hot_score', '-id')
+        ids = list(hottest.values_list('pk', flat=True)[:top_size()])
+        cache.set(CACHE_KEY, ids, refresh_seconds())
+    return ids
+
+
+def recompute():
+    """Rebuild every hot_score from Like/Comment timestamps; returns the number of posts scored."""
+    events = defaultdict(list)
+    for post_id, created_at in Like.objects.values_list('post_id', 'created_at').iterator():
+        events[post_id].append(event(likes=1, at=created_at))
+    for post_id, created_at in Comment.objects.values_list('post_id', 'created_at').iterator():
+        events[post_id].append(event(comments=1, at=created_at))
+    posts = [Post(pk=pk, hot_score=initial_score(post_events)) for pk, post_events in events.items()]
+    with transaction.atomic():
+        Post.objects.exclude(hot_score=0).update(hot_score=0)
+        Post.objects.bulk_update(posts, ['hot_score'], batch_size=500)
+    cache.delete(CACHE_KEY)
+    return len(posts)
+
+
+def initial_score(events):
+    """hot_score of a post with just these (positive) events: log2(1 + sum)."""
+    added, _ = score_change(events)
+    return log_sum([0.0, added])
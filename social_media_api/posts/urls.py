@@ -25,4 +25,8 @@ urlpatterns = [
         'patch': 'partial_update',
         'delete': 'destroy'
     }), name='post-comment-detail'),
+
+    path('posts/<int:post_pk>/comments/<int:pk>/thread/', CommentViewSet.as_view({
+        'get': 'thread'
+    }), name='post-comment-thread'),
 ]
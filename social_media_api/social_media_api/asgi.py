@@ -2,6 +2,8 @@
 ASGI config for social_media_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve through it (e.g. ``uvicorn social_media_api.asgi:application``) so that
+long-lived /api/notifications/stream/ connections don't each hold a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
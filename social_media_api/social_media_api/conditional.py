@@ -0,0 +1,103 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) for DRF list and retrieve.
+
+Validators are computed from the rows a response is built from, and only
+those: for a list, the page the paginator would return (its keyset window
+and LIMIT, see KeysetPagination.page_queryset), never the whole filtered
+table. One query reads each row's key, `updated_at` and denormalized
+counters; one more per embedded relation reads the latest `updated_at` of
+the related rows of just those keys. No serializer runs for this. A request
+whose If-None-Match (or If-Modified-Since) still matches gets a 304 before
+the page is loaded and serialized.
+
+The ETag also covers the query string, the requesting user and the
+negotiated format, so each variant of a URL validates separately, plus
+whatever `conditional_requester_state` reports about the requester's own
+rows (e.g. their likes of the page's posts, which buffered like counters
+don't reflect yet).
+Last-Modified only follows `updated_at` columns: counter changes (likes)
+move the ETag but not the date, and If-None-Match takes precedence when a
+client sends both, as RFC 9110 requires.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    # Model timestamp that moves on every edit of a row
+    conditional_timestamp_field = 'updated_at'
+    # Counter columns whose changes don't touch the timestamp
+    conditional_sum_fields = ()
+    # Timestamps of related rows embedded in the representation, e.g. 'comments__updated_at'
+    conditional_related_timestamps = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        if hasattr(paginator, 'page_queryset'):
+            queryset = paginator.page_queryset(queryset, request, view=self)
+        return self._conditional(request, self._validators(queryset, many=True),
+                                 super().list, args, kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            validators = self._validators(queryset.order_by(), many=False)
+        except (TypeError, ValueError, ValidationError):
+            # A malformed lookup value, as in DRF's get_object_or_404
+            validators = None
+        return self._conditional(request, validators, super().retrieve, args, kwargs)
+
+    def _validators(self, queryset, many):
+        """(state, last_modified) describing what the response would contain; None if no such object."""
+        fields = ('pk', self.conditional_timestamp_field, *self.conditional_sum_fields)
+        rows = tuple(queryset.prefetch_related(None).values_list(*fields))
+        if not many and not rows:
+            return None
+        timestamps = [row[1] for row in rows]
+        state = {'rows': rows}
+        if rows:
+            keys = [row[0] for row in rows]
+            for path in self.conditional_related_timestamps:
+                # Separate query: joining above would repeat rows per related row
+                related = queryset.model._default_manager.filter(pk__in=keys)
+                state[path] = related.aggregate(value=Max(path))['value']
+                timestamps.append(state[path])
+            requester = self.conditional_requester_state(keys)
+            if requester is not None:
+                state['requester'] = requester
+        last_modified = max((t for t in timestamps if t is not None), default=None)
+        return tuple(sorted(state.items())), last_modified
+
+    def conditional_requester_state(self, keys):
+        """What the representation of these rows shows about the requesting user alone; None if nothing."""
+        return None
+
+    def _etag(self, request, state):
+        variant = (
+            state,
+            request.get_full_path(),
+            request.user.pk,
+            getattr(request, 'accepted_media_type', ''),
+        )
+        return quote_etag(hashlib.md5(repr(variant).encode(), usedforsecurity=False).hexdigest())
+
+    def _conditional(self, request, validators, render, args, kwargs):
+        if validators is None:
+            # Unknown object: let the normal path answer 404
+            return render(request, *args, **kwargs)
+        state, last_modified = validators
+        etag = self._etag(request, state)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render(request, *args, **kwargs)
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
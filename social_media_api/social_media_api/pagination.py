@@ -0,0 +1,175 @@
+"""
+Keyset (seek) pagination shared by the posts and notifications APIs.
+
+Unlike PageNumberPagination this never issues OFFSET or COUNT(*): each page
+is a range read that continues from the last row of the previous page, so
+latency stays flat however deep a client scrolls. Cursors are opaque tokens
+holding the ordering values of the boundary row.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_window(queryset, ordering, position=None, reverse=False):
+    """
+    `queryset` in `ordering` (flipped for a backwards page), from the row
+    strictly after `position`, the ordering values of the boundary row.
+    """
+    queryset = queryset.order_by(*[_flip(field) if reverse else field for field in ordering])
+    if position is None:
+        return queryset
+    # (a > x) OR (a = x AND b > y) OR ...
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+        equal[name] = value
+    # ... AND a >= x, which the planner can turn into an index range; the OR
+    # alone leaves it walking the index from the start, skipping earlier pages
+    first = ordering[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') != reverse else 'gte'}": position[0]})
+    return queryset.filter(bound & condition)
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f"-{field}"
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on a composite ordering whose last field is unique, e.g.
+    ('-created_at', '-id'). Views exposing an OrderingFilter may switch the
+    leading field to any of their `ordering_fields`.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        results = list(self.page_queryset(queryset, request, view))
+        reverse, position = self.reverse, self.position
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        The rows of the requested page plus one more (which tells whether
+        there is a next page), as a sliced queryset, without loading them.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(request, view)
+        self.model = queryset.model
+        self.reverse, self.position = self.decode_cursor(request)
+        return self.window(queryset, self.position, self.reverse)[:self.page_size + 1]
+
+    def window(self, queryset, position, reverse):
+        """The rows after `position` in page order; the page is its first page_size."""
+        return keyset_window(queryset, self.fields, position, reverse)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, view):
+        """The configured ordering, or the view's OrderingFilter choice plus the tie-breaker."""
+        requested = request.query_params.get(api_settings.ORDERING_PARAM, '').split(',')[0].strip()
+        allowed = getattr(view, 'ordering_fields', None) or ()
+        if requested and requested.lstrip('-') in allowed:
+            tie_breaker = self.ordering[-1].lstrip('-')
+            return (requested, f"-{tie_breaker}" if requested.startswith('-') else tie_breaker)
+        return tuple(self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        values = [getattr(obj, field.lstrip('-')) for field in self.fields]
+        # isoformat() keeps microseconds, which the seek comparison needs to be exact
+        payload = json.dumps({'r': int(reverse), 'v': values}, default=lambda value: value.isoformat())
+        token = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()).decode())
+            values = payload['v']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return bool(payload.get('r')), position
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -75,6 +75,24 @@ DATABASES = {
 DATABASES['default'].setdefault('PORT', os.getenv('DB_PORT', '5432'))
 
 
+# Local-memory cache by default; point this at Redis/Memcached when running
+# several processes so token snapshots and the trending list are shared
+# between them (unread counters live in the database, see notifications.unread)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Anonymous API responses (social_media_api/response_cache.py): LRU with TTL.
+    # Use 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION
+    # directory to share entries between the processes of one host.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -99,7 +117,7 @@ AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -108,3 +126,66 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
+
+# Cache alias and TTL (seconds) for anonymous list/retrieve responses
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 60
+
+# Token lookups (accounts.authentication): shared cache TTL, then the per-process
+# LRU's TTL and size. Other processes notice a revoked token after the local TTL.
+ACCOUNTS_TOKEN_CACHE_TTL = 5 * 60
+ACCOUNTS_TOKEN_CACHE_LOCAL_TTL = 30
+ACCOUNTS_TOKEN_CACHE_SIZE = 10000
+
+# Serve register/login from async views that hash passwords in a process pool
+# (best under ASGI); more than MAX_PENDING queued hashes get a 503
+ACCOUNTS_ASYNC_HASHING = False
+ACCOUNTS_HASHING_WORKERS = 2
+ACCOUNTS_HASHING_MAX_PENDING = 32
+
+# Home timeline: authors with at least this many followers are fanned out on read
+POSTS_FANOUT_THRESHOLD = 1000
+# How many recent posts are copied into a timeline when a user follows someone
+POSTS_TIMELINE_BACKFILL = 50
+# Latest comments embedded in each serialized post
+POSTS_COMMENT_PREVIEW = 5
+# Deepest reply level allowed in comment threads (top-level comments are 0; at most 24)
+POSTS_COMMENT_MAX_DEPTH = 10
+# Full-text search (posts/search.py): None picks SQLite FTS5 when available,
+# else a LIKE fallback; or a dotted path to another backend class
+POSTS_SEARCH_BACKEND = None
+# Best matches re-ranked by recency, and how fast the recency boost fades
+POSTS_SEARCH_CANDIDATES = 200
+POSTS_SEARCH_HALF_LIFE_DAYS = 30
+# Trending posts (posts/trending.py): engagement halves in weight every this many
+# hours; the top POSTS_TRENDING_SIZE ids are cached for REFRESH_SECONDS.
+# Changing it (or POSTS_TRENDING_EPOCH, default 2025-01-01 UTC) needs
+# `manage.py recompute_trending_scores`.
+POSTS_TRENDING_HALF_LIFE_HOURS = 24
+POSTS_TRENDING_SIZE = 100
+POSTS_TRENDING_REFRESH_SECONDS = 60
+# Trending hashtags count uses over this many trailing hours
+POSTS_TRENDING_TAG_HOURS = 24
+# Queue like count changes (a LikeCountDelta row per like) and write them in one
+# UPDATE at most every POSTS_LIKE_FLUSH_SECONDS (posts/counters.py); for posts
+# that get like storms
+POSTS_BUFFER_LIKE_COUNTS = False
+POSTS_LIKE_FLUSH_SECONDS = 5
+
+# Notifications are queued and written by `manage.py dispatch_notifications`;
+# True drains the queue inside the request instead (no worker needed)
+NOTIFICATIONS_DISPATCH_INLINE = False
+# Repeated events on the same target within this many hours share one notification
+NOTIFICATIONS_AGGREGATION_HOURS = 24
+# Actors kept on an aggregated notification for "alice, bob and 40 others"
+NOTIFICATIONS_RECENT_ACTORS = 3
+# Seconds before a stored unread counter is recounted from the notifications
+NOTIFICATIONS_UNREAD_TTL = 24 * 60 * 60
+# Default age limit for `manage.py prune_notifications`
+NOTIFICATIONS_RETENTION_DAYS = 90
+# Live notification stream (/api/notifications/stream/)
+NOTIFICATIONS_PUBSUB_BACKEND = 'notifications.pubsub.InMemoryBroker'
+# Re-check the database this often when no in-process wake-up arrives
+NOTIFICATIONS_STREAM_POLL_SECONDS = 15
+# Close streams after this long; clients resume with Last-Event-ID
+NOTIFICATIONS_STREAM_MAX_SECONDS = 300